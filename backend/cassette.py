@@ -0,0 +1,184 @@
+"""
+Record/Replay Cassettes for Provider Traffic
+An httpx transport that records explorer and RPC responses to a gzipped JSONL
+cassette, or replays them with no network access. JSON-RPC batches and
+BlockCypher multi-hash lookups are stored per call, so replay does not depend
+on how lookups happened to be batched when recording.
+"""
+
+import gzip
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Transient failures are not worth replaying; the client would retry them anyway
+UNRECORDED_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode for a request the cassette has no response for"""
+
+
+class Cassette:
+    """Recorded responses keyed by request, plus the verifications that produced them"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.verifications: List[Dict[str, Any]] = []
+        self.dirty = False
+        if os.path.exists(path):
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["kind"] == "verification":
+                        self.verifications.append(entry)
+                    else:
+                        self.responses[entry["key"]] = entry
+
+    def put(self, key: str, status: int, body: Any):
+        """Store a response body: parsed JSON, or ``{"text": ...}`` for anything else"""
+        self.responses[key] = {"kind": "response", "key": key, "status": status, "body": body}
+        self.dirty = True
+
+    def add_verification(self, args: Dict[str, Any], result: Tuple):
+        self.verifications.append({"kind": "verification", "args": args, "result": list(result)})
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt") as f:
+            for entry in self.responses.values():
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            for entry in self.verifications:
+                f.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        logger.info(f"Saved {len(self.responses)} responses to cassette {self.path}")
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Records responses from ``inner`` (mode "record") or serves them from the cassette (mode "replay")
+
+    ``aliases`` maps RPC endpoint URLs to a chain name so every endpoint of a
+    pool shares the same recorded calls.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        mode: str,
+        aliases: Dict[str, str],
+        inner: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.cassette = cassette
+        self.mode = mode
+        self.aliases = {url.rstrip("/"): name for url, name in aliases.items()}
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if request.method == "POST" and url.rstrip("/") in self.aliases:
+            return await self._rpc(request, self.aliases[url.rstrip("/")])
+        if "/txs/" in request.url.path and ";" in request.url.path:
+            return await self._multi_hash(request)
+
+        key = f"{request.method} {_endpoint(request.url)}"
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            return _response(entry["status"], entry["body"])
+
+        response = await self._forward(request)
+        if response.status_code not in UNRECORDED_STATUSES:
+            self.cassette.put(key, response.status_code, _body(response))
+        return response
+
+    async def _rpc(self, request: httpx.Request, chain: str) -> httpx.Response:
+        payload = json.loads(request.content)
+        calls = payload if isinstance(payload, list) else [payload]
+        keys = [f"RPC {chain} {call.get('method')} {json.dumps(call.get('params'), sort_keys=True)}" for call in calls]
+
+        if self.mode == "replay":
+            replies = []
+            for call, key in zip(calls, keys):
+                reply = dict(self._lookup(key)["body"])
+                reply["id"] = call.get("id")
+                replies.append(reply)
+            return _response(200, replies if isinstance(payload, list) else replies[0])
+
+        response = await self._forward(request)
+        if response.status_code == 200:
+            body = response.json()
+            replies = {reply.get("id"): reply for reply in (body if isinstance(body, list) else [body])}
+            for call, key in zip(calls, keys):
+                reply = replies.get(call.get("id"))
+                if reply is not None and "error" not in reply:
+                    self.cassette.put(key, 200, {key: value for key, value in reply.items() if key != "id"})
+        return response
+
+    async def _multi_hash(self, request: httpx.Request) -> httpx.Response:
+        # Keyed like the single-hash lookup of each transaction
+        base, _, hashes = _endpoint(request.url).rpartition("/")
+        hashes = hashes.split(";")
+        keys = [f"GET {base}/{tx_hash}" for tx_hash in hashes]
+
+        if self.mode == "replay":
+            return _response(200, [self._lookup(key)["body"] for key in keys])
+
+        response = await self._forward(request)
+        if response.status_code == 200:
+            txs = response.json()
+            by_hash = {tx.get("hash"): tx for tx in txs if isinstance(tx, dict) and tx.get("hash")}
+            for position, (tx_hash, key) in enumerate(zip(hashes, keys)):
+                if tx_hash in by_hash:
+                    self.cassette.put(key, 200, by_hash[tx_hash])
+                elif len(txs) == len(hashes):
+                    # Unknown hashes come back in place as {"error": ...}, as a single lookup's 404 body
+                    self.cassette.put(key, 404, txs[position])
+        return response
+
+    async def _forward(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        return response
+
+    def _lookup(self, key: str) -> Dict[str, Any]:
+        entry = self.cassette.responses.get(key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {key}")
+        return entry
+
+    async def aclose(self):
+        if self.mode == "record":
+            self.cassette.save()
+        await self.inner.aclose()
+
+
+def _endpoint(url: httpx.URL) -> str:
+    """URL without scheme noise, with query parameters in a stable order"""
+    parts = urlsplit(str(url))
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    return f"{parts.netloc}{parts.path}" + (f"?{query}" if query else "")
+
+
+def _body(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return {"text": response.text}
+
+
+def _response(status: int, body: Any) -> httpx.Response:
+    if isinstance(body, dict) and set(body) == {"text"}:
+        return httpx.Response(status, text=body["text"])
+    return httpx.Response(status, json=body)
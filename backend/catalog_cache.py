@@ -0,0 +1,92 @@
+"""
+In-Process Catalog Snapshots
+Holds the storefront's product listing and performance metric as
+pre-serialized JSON bytes with strong ETags, so repeat visits can be answered
+with a 304 and no database round trip
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+
+class Snapshot:
+    """Serialized response body with its ETag and any extra headers"""
+
+    def __init__(self, body: bytes, headers: Dict[str, str], version: int):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.headers = headers
+        self.version = version
+        self.built_at = time.monotonic()
+
+
+# Loader returns the JSON-ready payload and extra response headers
+Loader = Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]]
+
+
+class CatalogCache:
+    """Versioned snapshots keyed by name, rebuilt on invalidation or after ``ttl`` seconds
+
+    The TTL bounds how long other worker processes can serve a snapshot that
+    was invalidated elsewhere.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._versions: Dict[str, int] = {}
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, name: str):
+        """Discard a snapshot; the next read rebuilds it"""
+        self._versions[name] = self._versions.get(name, 0) + 1
+        self._snapshots.pop(name, None)
+
+    def _fresh(self, name: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(name)
+        if (
+            snapshot
+            and snapshot.version == self._versions.get(name, 0)
+            and time.monotonic() - snapshot.built_at < self.ttl
+        ):
+            return snapshot
+        return None
+
+    async def get(self, name: str, loader: Loader) -> Snapshot:
+        snapshot = self._fresh(name)
+        if snapshot:
+            return snapshot
+        # One rebuild at a time; concurrent readers wait for it instead of all hitting MongoDB
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            snapshot = self._fresh(name)
+            if snapshot:
+                return snapshot
+            version = self._versions.get(name, 0)
+            payload, headers = await loader()
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            snapshot = Snapshot(body, headers, version)
+            if version == self._versions.get(name, 0):
+                self._snapshots[name] = snapshot
+            return snapshot
+
+    async def respond(self, name: str, loader: Loader, request: Request) -> Response:
+        """Serve a snapshot, or 304 when the client already holds the current ETag"""
+        snapshot = await self.get(name, loader)
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache", **snapshot.headers}
+        if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
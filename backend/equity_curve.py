@@ -0,0 +1,90 @@
+"""
+Equity Curve and Drawdown Series for Charting
+Builds a product's balance curve from its trade log and downsamples it with
+Largest-Triangle-Three-Buckets (LTTB) so charts keep peaks and troughs
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points LTTB keeps when reducing (x, y) to ``threshold`` points"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        # Average of the following bucket; the final bucket looks ahead to the last point
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Twice the triangle area formed with the previous pick and the next bucket's average
+        area = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(area))
+        indices[i + 1] = anchor
+    return indices
+
+
+def build_curve(net_profit: np.ndarray, initial_balance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(equity, drawdown %) after each closed trade, in close-time order"""
+    equity = initial_balance + np.cumsum(net_profit)
+    peaks = np.maximum.accumulate(np.concatenate(([initial_balance], equity)))[1:]
+    drawdown = (peaks - equity) / peaks * 100
+    return equity, drawdown
+
+
+def downsample_series(timestamps: np.ndarray, values: np.ndarray, points: int) -> List[List[float]]:
+    """[[timestamp_ms, value], ...] reduced to at most ``points`` entries"""
+    keep = lttb_indices(timestamps.astype(np.float64), values, points)
+    return [[int(t), round(float(v), 4)] for t, v in zip(timestamps[keep], values[keep])]
+
+
+class EquityCurveCache:
+    """LRU of downsampled curves, keyed by product and request, invalidated per product
+
+    Entries also expire after ``ttl`` seconds, which bounds how long other
+    worker processes serve a curve invalidated elsewhere.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (product_id, key) -> (built_at, curve)
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, product_id: str, key: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get((product_id, key))
+        if entry is None:
+            return None
+        built_at, value = entry
+        if time.monotonic() - built_at >= self.ttl:
+            del self._entries[(product_id, key)]
+            return None
+        self._entries.move_to_end((product_id, key))
+        return value
+
+    def put(self, product_id: str, key: Hashable, value: Dict[str, Any]):
+        self._entries[(product_id, key)] = (time.monotonic(), value)
+        self._entries.move_to_end((product_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, product_id: str):
+        """Drop every cached curve of a product, e.g. after new trades are ingested"""
+        for cache_key in [k for k in self._entries if k[0] == product_id]:
+            del self._entries[cache_key]
@@ -0,0 +1,73 @@
+"""
+Fast JSON Response Path
+Opt-in (FAST_JSON_RESPONSES=1) serialization of trusted MongoDB projections
+straight to bytes with orjson, skipping response model validation except in
+debug mode (DEBUG_RESPONSE_VALIDATION=1)
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FAST_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "").lower() in ("1", "true", "yes")
+VALIDATE_RESPONSES = os.environ.get("DEBUG_RESPONSE_VALIDATION", "").lower() in ("1", "true", "yes")
+
+if FAST_RESPONSES and orjson is None:
+    logger.warning("FAST_JSON_RESPONSES is set but orjson is not installed; using the json module")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # UTC as "Z", matching pydantic
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Compact JSON bytes; datetimes become ISO 8601 strings as with the response models"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_UTC_Z)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """MongoDB projection returning exactly the model's fields"""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+
+class TrustedDocuments:
+    """Serializes documents read with ``model_projection(model)`` as the model would
+
+    Plain field defaults are filled in for documents written before a field
+    existed; validation against the model only runs when VALIDATE_RESPONSES is set.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.projection = model_projection(model)
+        self.defaults = {
+            name: field.default
+            for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+        self._one = TypeAdapter(model)
+        self._many = TypeAdapter(List[model])
+
+    def response(self, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+        """``payload`` is one document or a list of them"""
+        many = isinstance(payload, list)
+        payload = [{**self.defaults, **doc} for doc in payload] if many else {**self.defaults, **payload}
+        if VALIDATE_RESPONSES:
+            (self._many if many else self._one).validate_python(payload)
+        return Response(content=dumps(payload), media_type="application/json", headers=headers)
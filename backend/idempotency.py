@@ -0,0 +1,141 @@
+"""
+Idempotency Keys for Retried POST Requests
+Stores the response of the first request made with an Idempotency-Key and
+returns it to every retry, collapsing concurrent duplicates in-process
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Matches the expireAfterSeconds of the idempotency_keys TTL index
+KEY_TTL = timedelta(hours=24)
+
+# A key left in progress this long belongs to a request that died mid-way
+STALE_AFTER = timedelta(seconds=60)
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key cannot be honoured; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request body, to detect a key reused for a different request"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Runs each (scope, key) once and remembers its result for ``KEY_TTL``
+
+    Retries that arrive while the first request is still running in this
+    process wait for it; retries that reach another process while it runs get
+    a 409. Failed requests release their key so the client can retry.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._in_flight: Dict[Tuple[str, str], Tuple[str, asyncio.Future]] = {}
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        create: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Return (response, replayed) for the request identified by ``key``"""
+        in_flight = self._in_flight.get((scope, key))
+        if in_flight is not None:
+            if in_flight[0] != fingerprint:
+                raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+            return dict(await asyncio.shield(in_flight[1])), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[(scope, key)] = (fingerprint, future)
+        try:
+            stored = await self._claim(scope, key, fingerprint)
+            if stored is not None:
+                future.set_result(stored)
+                return dict(stored), True
+
+            try:
+                response = await create()
+            except BaseException:
+                await self._release(scope, key)
+                raise
+            await self.collection.update_one(
+                {"scope": scope, "key": key},
+                {"$set": {"status": "completed", "response": response}}
+            )
+            future.set_result(response)
+            return response, False
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Nobody may be waiting; retrieve it so asyncio does not log it
+                future.exception()
+            raise
+        finally:
+            del self._in_flight[(scope, key)]
+
+    async def _claim(self, scope: str, key: str, fingerprint: str):
+        """Reserve the key, or return the stored response of an earlier request"""
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.insert_one({
+                "scope": scope,
+                "key": key,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        existing = await self.collection.find_one({"scope": scope, "key": key}, {"_id": 0})
+        if existing is None:
+            # Expired between our insert and read; claim it afresh
+            return await self._claim(scope, key, fingerprint)
+        if existing["fingerprint"] != fingerprint:
+            raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+        if existing["status"] == "completed":
+            return existing["response"]
+
+        # Another process holds the key; take it over only if that request died
+        taken = await self.collection.find_one_and_update(
+            {
+                "scope": scope,
+                "key": key,
+                "status": "in_progress",
+                "created_at": {"$lt": now - STALE_AFTER}
+            },
+            {"$set": {"created_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken is None:
+            raise IdempotencyConflict(409, "A request with this Idempotency-Key is still in progress")
+        logger.warning(f"Taking over stale idempotency key {scope}/{key}")
+        return None
+
+    async def _release(self, scope: str, key: str):
+        try:
+            await self.collection.delete_one({"scope": scope, "key": key, "status": "in_progress"})
+        except Exception as e:
+            logger.error(f"Releasing idempotency key {scope}/{key} failed: {str(e)}")
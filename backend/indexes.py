@@ -0,0 +1,176 @@
+"""
+MongoDB Index Registry
+Declares the indexes the API relies on, creates them once at startup and
+warns about queries that none of the declared indexes can serve
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from pymongo import ASCENDING, DESCENDING, monitoring
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# collection -> index specs: "keys" plus any create_index options
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "products": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    ],
+    "orders": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("license_key", ASCENDING)], "unique": True},
+        # Keyset pagination order; also serves plain created_at sorts
+        {"keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+        {"keys": [("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("verification_status", ASCENDING), ("created_at", DESCENDING)]},
+        # License index sync reads orders verified since its last pass
+        {"keys": [("verified_at", ASCENDING)]},
+        # Orders without a hash store null, which a sparse index would still
+        # include; a partial filter keeps those out of the uniqueness check
+        {
+            "keys": [("transaction_hash", ASCENDING)],
+            "unique": True,
+            "partialFilterExpression": {"transaction_hash": {"$type": "string"}}
+        },
+    ],
+    "verification_jobs": [
+        {"keys": [("id", ASCENDING)], "unique": True},
+        {"keys": [("status", ASCENDING), ("lease_expires_at", ASCENDING)]},
+        {"keys": [("owner", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "trades": [
+        # Re-uploaded statements are deduplicated by ticket
+        {"keys": [("product_id", ASCENDING), ("ticket", ASCENDING)], "unique": True},
+        {"keys": [("product_id", ASCENDING), ("close_time", ASCENDING)]},
+    ],
+    "transaction_cache": [
+        {"keys": [("chain", ASCENDING), ("tx_hash", ASCENDING)], "unique": True},
+    ],
+    "wallet_transfers": [
+        {"keys": [("transaction_hash", ASCENDING)], "unique": True},
+        {"keys": [("status", ASCENDING), ("occurred_at", ASCENDING)]},
+        # Transfers are matched for 3 days (wallet_watcher.MATCH_WINDOW)
+        {"keys": [("seen_at", ASCENDING)], "expireAfterSeconds": 3 * 24 * 3600},
+    ],
+    "idempotency_keys": [
+        {"keys": [("scope", ASCENDING), ("key", ASCENDING)], "unique": True},
+        # Keys are honoured for 24 hours (idempotency.KEY_TTL)
+        {"keys": [("created_at", ASCENDING)], "expireAfterSeconds": 86400},
+    ],
+}
+
+
+async def ensure_indexes(db, registry: Dict[str, List[Dict[str, Any]]] = INDEX_REGISTRY):
+    """Create every registered index; failures are logged so startup can continue"""
+    for collection_name, specs in registry.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                await db[collection_name].create_index(spec["keys"], **options)
+            except PyMongoError as e:
+                logger.error(f"Could not create index {spec['keys']} on {collection_name}: {str(e)}")
+    logger.info("Database indexes ensured")
+
+
+# Commands that filter documents: command name -> field holding the filter
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+class UnindexedQueryListener(monitoring.CommandListener):
+    """Logs a warning, once per query shape, when a filter or sort has no usable index
+
+    A query is considered indexed when one of its filter fields (or, for an
+    empty filter, its first sort field) is the leading key of a registered
+    index or ``_id``.
+    """
+
+    def __init__(self, registry: Dict[str, List[Dict[str, Any]]] = INDEX_REGISTRY):
+        self.leading_keys: Dict[str, Set[str]] = {
+            name: {spec["keys"][0][0] for spec in specs} | {"_id"}
+            for name, specs in registry.items()
+        }
+        self._warned: Set[Tuple] = set()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        try:
+            for collection, query, sort in _extract_queries(event.command_name, event.command):
+                self._check(collection, query, sort)
+        except Exception:
+            # Never let diagnostics interfere with the query itself
+            pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def _check(self, collection: str, query: Dict[str, Any], sort: Iterable[str]):
+        leading = self.leading_keys.get(collection, {"_id"})
+        sort = list(sort)
+        if query:
+            if _indexable(query, leading):
+                return
+        elif not sort or sort[0] in leading:
+            # Unfiltered reads are deliberate listings and only need an index for their sort
+            return
+
+        shape = (collection, tuple(sorted(_fields(query))), tuple(sort))
+        with self._lock:
+            if shape in self._warned:
+                return
+            self._warned.add(shape)
+        logger.warning(
+            f"Query on '{collection}' has no supporting index: filter fields {list(shape[1])}, sort {sort}"
+        )
+
+
+def _extract_queries(command_name: str, command: Dict[str, Any]):
+    """Yield (collection, filter, sort fields) for each query inside a command"""
+    collection = command.get(command_name)
+    if not isinstance(collection, str):
+        return
+    if command_name in _FILTER_FIELDS:
+        yield collection, command.get(_FILTER_FIELDS[command_name]) or {}, (command.get("sort") or {}).keys()
+    elif command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        if pipeline and "$match" in pipeline[0]:
+            yield collection, pipeline[0]["$match"], []
+    elif command_name == "update":
+        for update in command.get("updates", []):
+            yield collection, update.get("q") or {}, []
+    elif command_name == "delete":
+        for delete in command.get("deletes", []):
+            yield collection, delete.get("q") or {}, []
+
+
+def _fields(query: Dict[str, Any]) -> Set[str]:
+    fields = set()
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            for clause in value:
+                fields |= _fields(clause)
+        elif not key.startswith("$"):
+            fields.add(key)
+    return fields
+
+
+def _indexable(query: Dict[str, Any], leading: Set[str]) -> bool:
+    """Whether some index can narrow this filter; every $or branch must be indexable"""
+    for key, value in query.items():
+        if key == "$and" and any(_indexable(clause, leading) for clause in value):
+            return True
+        if key == "$or" and all(_indexable(clause, leading) for clause in value):
+            return True
+        if key in leading:
+            return True
+    return False
@@ -0,0 +1,192 @@
+"""
+In-Memory License Key Index
+Serves license validation for EA terminals from a dict of every license key
+and its order status, with a Bloom filter answering unknown keys without
+touching MongoDB. A few seconds after another process creates or verifies an
+order, an incremental sync brings it into the index
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+from metrics import LICENSE_VALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+# Orders in these statuses have paid for their license
+ACTIVE_STATUSES = ["verified", "completed"]
+
+LICENSE_PROJECTION = {"_id": 0, "license_key": 1, "id": 1, "product_id": 1, "status": 1}
+
+# Each sync re-reads this much before the previous one, for writes that were
+# still in flight or stamped by a slightly slower clock
+SYNC_OVERLAP = timedelta(seconds=10)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of one BLAKE2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class LicenseIndex:
+    """License key -> order summary for every order, kept current by the order write paths
+
+    Until the first load finishes lookups go to MongoDB. Every ``sync_interval``
+    seconds the orders other processes created or verified since the last
+    sync are read in; a full reload every ``refresh_interval`` seconds picks up
+    any other change, such as an admin status update.
+    """
+
+    def __init__(
+        self,
+        orders,
+        refresh_interval: float = 300.0,
+        error_rate: float = 0.001,
+        sync_interval: float = 5.0
+    ):
+        self.orders = orders
+        self.refresh_interval = refresh_interval
+        self.sync_interval = sync_interval
+        self.error_rate = error_rate
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.bloom = BloomFilter(1024, error_rate)
+        self.ready = False
+        self._changed: Optional[Set[str]] = None  # keys written while a load is scanning
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Rebuild the index and filter from the orders collection"""
+        started = datetime.now(timezone.utc)
+        self._changed = set()
+        try:
+            entries = {}
+            async for doc in self.orders.find({}, LICENSE_PROJECTION):
+                entries[doc["license_key"]] = _entry(doc)
+            # Writes made while the scan ran are newer than what it read
+            for key in self._changed:
+                entries[key] = self.entries[key]
+        finally:
+            self._changed = None
+        self.entries, self.bloom = entries, self._bloom_for(entries)
+        self._synced_at = started
+        self.ready = True
+        logger.info(f"License index loaded {len(entries)} keys")
+
+    async def sync(self):
+        """Read in orders created or verified since the last load or sync"""
+        started = datetime.now(timezone.utc)
+        since = self._synced_at - SYNC_OVERLAP
+        async for doc in self.orders.find(
+            {"$or": [{"created_at": {"$gte": since}}, {"verified_at": {"$gte": since}}]},
+            LICENSE_PROJECTION
+        ):
+            self.add(doc)
+        self._synced_at = started
+
+    def _bloom_for(self, entries: Dict[str, Dict[str, Any]]) -> BloomFilter:
+        # Room to double before the false positive rate degrades
+        bloom = BloomFilter(max(2 * len(entries), 1024), self.error_rate)
+        for key in entries:
+            bloom.add(key)
+        return bloom
+
+    def add(self, order: Dict[str, Any]):
+        """Index a newly created order, or refresh one already indexed"""
+        known = order["license_key"] in self.entries
+        self.entries[order["license_key"]] = _entry(order)
+        if self._changed is not None:
+            self._changed.add(order["license_key"])
+        if known:
+            return
+        if self.bloom.count >= self.bloom.capacity:
+            self.bloom = self._bloom_for(self.entries)
+        else:
+            self.bloom.add(order["license_key"])
+
+    def set_status(self, license_key: Optional[str], status: str):
+        """Record a status change made by this process"""
+        entry = self.entries.get(license_key) if license_key else None
+        if entry is not None:
+            entry["status"] = status
+            entry["active"] = status in ACTIVE_STATUSES
+            if self._changed is not None:
+                self._changed.add(license_key)
+
+    async def lookup(self, license_key: str) -> Optional[Dict[str, Any]]:
+        """Order summary for ``license_key``, or None for an unknown key"""
+        if self.ready:
+            if license_key not in self.bloom:
+                LICENSE_VALIDATIONS.labels(source="bloom").inc()
+                return None
+            entry = self.entries.get(license_key)
+            if entry is not None:
+                LICENSE_VALIDATIONS.labels(source="memory").inc()
+                return entry
+
+        # Not loaded yet, or a Bloom false positive
+        LICENSE_VALIDATIONS.labels(source="database").inc()
+        doc = await self.orders.find_one({"license_key": license_key}, LICENSE_PROJECTION)
+        if not doc:
+            return None
+        if self.ready:
+            self.add(doc)
+        return _entry(doc)
+
+    def start(self):
+        """Load the index in the background and keep reloading it"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="license-index")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        loaded_at = None
+        while True:
+            try:
+                if loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval:
+                    await self.load()
+                    loaded_at = time.monotonic()
+                else:
+                    await self.sync()
+            except Exception as e:
+                logger.error(f"License index refresh failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+
+def _entry(order: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "order_id": order["id"],
+        "product_id": order["product_id"],
+        "status": order["status"],
+        "active": order["status"] in ACTIVE_STATUSES
+    }
@@ -0,0 +1,87 @@
+"""
+Signed License Leases
+Short-lived Ed25519-signed JWTs that EA terminals verify offline with the
+store's public key, contacting the API only to renew them
+"""
+
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+logger = logging.getLogger(__name__)
+
+ISSUER = "ea-store"
+ALGORITHM = "EdDSA"
+
+# Expired leases are dropped from the cache once it grows past this
+MAX_CACHED_LEASES = 20000
+
+
+class LeaseSigner:
+    """Issues leases for active licenses and reuses each one until half its lifetime has passed"""
+
+    def __init__(self, private_key_pem: Optional[str] = None, ttl: float = 21600.0):
+        if private_key_pem:
+            # Env files often carry the PEM on one line with escaped newlines
+            pem = private_key_pem.replace("\\n", "\n").encode()
+            self.private_key = serialization.load_pem_private_key(pem, password=None)
+            if not isinstance(self.private_key, Ed25519PrivateKey):
+                raise ValueError("LICENSE_SIGNING_KEY must be an Ed25519 private key")
+        else:
+            logger.warning(
+                "LICENSE_SIGNING_KEY is not set; signing leases with an ephemeral key, "
+                "so terminals must refetch the public key after every restart"
+            )
+            self.private_key = Ed25519PrivateKey.generate()
+        self.ttl = ttl
+        public_raw = self.private_key.public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        self.key_id = hashlib.sha256(public_raw).hexdigest()[:16]
+        self._leases: Dict[str, Dict[str, Any]] = {}  # license_key -> lease response
+
+    def public_key(self) -> Dict[str, str]:
+        pem = self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return {"algorithm": ALGORITHM, "kid": self.key_id, "public_key": pem.decode()}
+
+    def issue(self, license_key: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Lease for an active license index entry"""
+        now = time.time()
+        cached = self._leases.get(license_key)
+        if cached and cached["renew_after"] > now:
+            return cached
+
+        expires_at = int(now + self.ttl)
+        token = jwt.encode(
+            {
+                "iss": ISSUER,
+                "sub": license_key,
+                "order_id": entry["order_id"],
+                "product_id": entry["product_id"],
+                "iat": int(now),
+                "exp": expires_at
+            },
+            self.private_key,
+            algorithm=ALGORITHM,
+            headers={"kid": self.key_id}
+        )
+        lease = {
+            "lease": token,
+            "expires_at": expires_at,
+            # Terminals renew halfway, so a renewal outage shorter than that goes unnoticed
+            "renew_after": int(now + self.ttl / 2)
+        }
+        self._leases[license_key] = lease
+        self._prune(now)
+        return lease
+
+    def _prune(self, now: float):
+        if len(self._leases) > MAX_CACHED_LEASES:
+            self._leases = {key: lease for key, lease in self._leases.items() if lease["renew_after"] > now}
@@ -0,0 +1,138 @@
+"""
+Prometheus Instrumentation
+Latency histograms for API routes, blockchain provider calls and MongoDB
+commands, plus verification gauges, exposed in text format at /metrics
+"""
+
+import threading
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+
+REGISTRY = CollectorRegistry()
+
+# Upstream explorers and RPCs answer in hundreds of milliseconds to tens of seconds
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an API request, including streaming the body",
+    ["method", "route", "status"],
+    registry=REGISTRY
+)
+PROVIDER_REQUEST_DURATION = Histogram(
+    "provider_request_duration_seconds",
+    "Duration of each HTTP attempt against a blockchain API provider",
+    ["provider", "outcome"],
+    buckets=SLOW_BUCKETS,
+    registry=REGISTRY
+)
+PROVIDER_REJECTIONS = Counter(
+    "provider_rejections_total",
+    "Provider calls refused locally by the rate limiter or circuit breaker",
+    ["provider", "reason"],
+    registry=REGISTRY
+)
+PAYMENT_VERIFICATION_DURATION = Histogram(
+    "payment_verification_duration_seconds",
+    "End-to-end duration of one payment verification",
+    ["payment_method", "outcome"],
+    buckets=SLOW_BUCKETS,
+    registry=REGISTRY
+)
+VERIFICATIONS_IN_FLIGHT = Gauge(
+    "payment_verifications_in_flight",
+    "Payment verifications currently talking to a provider",
+    ["payment_method"],
+    registry=REGISTRY
+)
+VERIFICATION_JOBS_PENDING = Gauge(
+    "verification_jobs_pending",
+    "Verification jobs waiting for a worker",
+    registry=REGISTRY
+)
+LICENSE_VALIDATIONS = Counter(
+    "license_validations_total",
+    "License validations by where they were answered: memory, bloom (unknown key) or database",
+    ["source"],
+    registry=REGISTRY
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "Duration of each MongoDB command as reported by the driver",
+    ["command", "collection", "outcome"],
+    buckets=FAST_BUCKETS,
+    registry=REGISTRY
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request by its matched route template
+
+    Unmatched paths share one label so scanners cannot blow up the series count.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route on the shared scope
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - started)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command by name and collection"""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        # getMore names its cursor id; the collection is a separate field
+        field = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(field)
+        with self._lock:
+            self._collections[(event.request_id, event.operation_id)] = (
+                collection if isinstance(collection, str) else ""
+            )
+
+    def succeeded(self, event):
+        self._observe(event, "success")
+
+    def failed(self, event):
+        self._observe(event, "failure")
+
+    def _observe(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop((event.request_id, event.operation_id), "")
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection, outcome).observe(
+            event.duration_micros / 1_000_000
+        )
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Current metrics in Prometheus text exposition format"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,131 @@
+"""
+One-Shot Data Migrations
+Converts ISO-8601 string timestamps written by older releases into native
+BSON datetimes, in bulk batches that can be interrupted and resumed
+
+Usage (from the backend directory):
+    python migrations.py [--batch-size 1000] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "native_datetimes"
+
+# (collection, field) pairs that used to be stored as ISO strings
+DATETIME_FIELDS: List[Tuple[str, str]] = [
+    ("products", "created_at"),
+    ("orders", "created_at"),
+    ("orders", "verified_at"),
+    ("verification_jobs", "created_at"),
+    ("verification_jobs", "started_at"),
+    ("verification_jobs", "finished_at"),
+    ("transaction_cache", "cached_at"),
+]
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp, treating naive values as UTC"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def migrate_field(db, collection: str, field: str, batch_size: int, dry_run: bool) -> Dict[str, int]:
+    """Convert one field in batches, checkpointing the last processed _id"""
+    checkpoint_key = f"{collection}.{field}"
+    state = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    last_id = state.get("checkpoints", {}).get(checkpoint_key)
+
+    converted = skipped = 0
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db[collection].find(query, {field: 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            try:
+                updates.append(UpdateOne(
+                    {"_id": doc["_id"], field: doc[field]},
+                    {"$set": {field: parse_timestamp(doc[field])}}
+                ))
+            except ValueError:
+                skipped += 1
+                logger.warning(f"{checkpoint_key}: unparseable value {doc[field]!r} on {doc['_id']}")
+
+        if updates and not dry_run:
+            result = await db[collection].bulk_write(updates, ordered=False)
+            converted += result.modified_count
+        else:
+            converted += len(updates)
+
+        last_id = batch[-1]["_id"]
+        if not dry_run:
+            await db.migrations.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {f"checkpoints.{checkpoint_key}": last_id}},
+                upsert=True
+            )
+        logger.info(f"{checkpoint_key}: {converted} converted so far")
+
+    return {"converted": converted, "skipped": skipped}
+
+
+async def migrate_datetimes(db, batch_size: int = 1000, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """Run the string-to-datetime migration over every known field"""
+    state = await db.migrations.find_one({"_id": MIGRATION_ID}) or {}
+    if state.get("completed_at"):
+        logger.info(f"Migration '{MIGRATION_ID}' already completed at {state['completed_at']}")
+        return {}
+
+    results = {}
+    for collection, field in DATETIME_FIELDS:
+        results[f"{collection}.{field}"] = await migrate_field(db, collection, field, batch_size, dry_run)
+
+    if not dry_run:
+        await db.migrations.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"completed_at": datetime.now(timezone.utc), "results": results}},
+            upsert=True
+        )
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert string timestamps to native BSON datetimes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Count convertible documents without writing")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        results = await migrate_datetimes(client[os.environ['DB_NAME']], args.batch_size, args.dry_run)
+        for name, counts in results.items():
+            logger.info(f"{name}: {counts['converted']} converted, {counts['skipped']} skipped")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Order Status Events
+In-process pub/sub hub fanning order status changes out to Server-Sent Event
+streams, so any number of open checkout tabs hear about one verification run
+"""
+
+import asyncio
+import json
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Set
+
+# Fields of an order that subscribers are told about
+EVENT_FIELDS = ["status", "verification_status", "verification_message"]
+
+# Once an order reaches one of these statuses its stream has nothing left to report
+FINAL_STATUSES = ["verified", "completed"]
+
+
+class OrderEventHub:
+    """Order ID -> subscriber queues; publishing never blocks the publisher
+
+    A subscriber that falls ``max_queue`` events behind loses the oldest ones;
+    each event carries the full set of ``EVENT_FIELDS`` it knows, so the
+    newest events are what matters.
+    """
+
+    def __init__(self, max_queue: int = 16):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    @contextmanager
+    def subscribe(self, order_id: str) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers.setdefault(order_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(order_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[order_id]
+
+    def publish(self, order_id: str, **fields):
+        """Send the changed fields of an order to everyone watching it"""
+        queues = self._subscribers.get(order_id)
+        if not queues:
+            return
+        event = {"order_id": order_id, **{key: fields[key] for key in EVENT_FIELDS if key in fields}}
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+def sse_message(event: Dict[str, Any], event_id: int) -> bytes:
+    return f"event: order\nid: {event_id}\ndata: {json.dumps(event, default=str)}\n\n".encode()
+
+
+async def order_event_stream(
+    hub: OrderEventHub,
+    orders,
+    order_id: str,
+    heartbeat: float = 15.0,
+    max_age: float = 600.0
+) -> AsyncIterator[bytes]:
+    """SSE body: the order's current state, then every change until it is final
+
+    Every heartbeat also re-reads the order, which picks up changes published
+    by other worker processes. Streams end after ``max_age`` seconds; browsers
+    reconnect on their own, and the endpoint answers the reconnect of a stream
+    that ended on a final status with 204 so they stop.
+    """
+    projection = {"_id": 0, **{field: 1 for field in EVENT_FIELDS}}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age
+    # Subscribe before reading so no change can slip between the two
+    with hub.subscribe(order_id) as queue:
+        state = await orders.find_one({"id": order_id}, projection) or {}
+        event_id = 1
+        yield b"retry: 3000\n" + sse_message({"order_id": order_id, **state}, event_id)
+        while state.get("status") not in FINAL_STATUSES and loop.time() < deadline:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                latest = await orders.find_one({"id": order_id}, projection) or {}
+                if latest == state:
+                    yield b": keepalive\n\n"
+                    continue
+                event = {"order_id": order_id, **latest}
+            state = {**state, **{key: value for key, value in event.items() if key != "order_id"}}
+            event_id += 1
+            yield sse_message({"order_id": order_id, **state}, event_id)
@@ -0,0 +1,122 @@
+"""
+Incrementally Maintained Order Statistics
+Keeps order counts and revenue in a single document updated with $inc on every
+status change, with a $facet reconciliation that recomputes it from scratch
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "orders"
+# Orders in these statuses count towards revenue
+REVENUE_STATUSES = ["verified", "completed"]
+
+
+class OrderStats:
+    """Counters for the admin dashboard, kept in one document of ``collection``"""
+
+    def __init__(self, collection, orders):
+        self.collection = collection
+        self.orders = orders
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+    async def record_created(self, status: str, amount: float):
+        """Count a newly inserted order"""
+        inc = {"total_orders": 1, f"by_status.{status}": 1}
+        if status in REVENUE_STATUSES:
+            inc["total_revenue"] = amount
+        await self._inc(inc)
+
+    async def record_transition(self, old_status: Optional[str], new_status: str, amount: float):
+        """Move an order between status counters; no-op when the status did not change"""
+        if old_status == new_status:
+            return
+        inc = {f"by_status.{new_status}": 1}
+        if old_status:
+            inc[f"by_status.{old_status}"] = -1
+        was_revenue = old_status in REVENUE_STATUSES
+        is_revenue = new_status in REVENUE_STATUSES
+        if is_revenue and not was_revenue:
+            inc["total_revenue"] = amount
+        elif was_revenue and not is_revenue:
+            inc["total_revenue"] = -amount
+        await self._inc(inc)
+
+    async def _inc(self, inc: Dict[str, Any]):
+        try:
+            await self.collection.update_one({"_id": STATS_ID}, {"$inc": inc}, upsert=True)
+        except Exception as e:
+            # Drift is corrected by the next reconciliation
+            logger.error(f"Order stats update failed: {str(e)}")
+
+    async def read(self) -> Dict[str, Any]:
+        """Current counters in the admin stats response shape"""
+        doc = await self.collection.find_one({"_id": STATS_ID})
+        if not doc or "reconciled_at" not in doc:
+            doc = await self.reconcile()
+        by_status = doc.get("by_status", {})
+        return {
+            "total_orders": doc.get("total_orders", 0),
+            "pending_orders": by_status.get("pending", 0),
+            "verified_orders": by_status.get("verified", 0),
+            "completed_orders": by_status.get("completed", 0),
+            "total_revenue": doc.get("total_revenue", 0)
+        }
+
+    async def reconcile(self) -> Dict[str, Any]:
+        """Recompute every counter with one aggregation and overwrite the stored document"""
+        pipeline = [
+            {"$facet": {
+                "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                "revenue": [
+                    {"$match": {"status": {"$in": REVENUE_STATUSES}}},
+                    {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+                ]
+            }}
+        ]
+        result = (await self.orders.aggregate(pipeline).to_list(1))[0]
+        by_status = {row["_id"]: row["count"] for row in result["by_status"] if row["_id"]}
+        doc = {
+            "total_orders": sum(by_status.values()),
+            "by_status": by_status,
+            "total_revenue": result["revenue"][0]["total"] if result["revenue"] else 0,
+            "reconciled_at": datetime.now(timezone.utc)
+        }
+
+        previous = await self.collection.find_one({"_id": STATS_ID})
+        if previous and "reconciled_at" in previous:
+            # Statuses decremented to zero are equivalent to absent ones
+            previous["by_status"] = {k: v for k, v in previous.get("by_status", {}).items() if v}
+            drift = {
+                key: (previous.get(key), doc[key])
+                for key in ("total_orders", "by_status", "total_revenue")
+                if previous.get(key) != doc[key]
+            }
+            if drift:
+                logger.warning(f"Order stats drift corrected: {drift}")
+
+        await self.collection.replace_one({"_id": STATS_ID}, doc, upsert=True)
+        return doc
+
+    def start_reconciler(self, interval: float):
+        """Reconcile now and then every ``interval`` seconds in the background"""
+        if not self._reconcile_task:
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop(interval))
+
+    async def stop_reconciler(self):
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+            await asyncio.gather(self._reconcile_task, return_exceptions=True)
+            self._reconcile_task = None
+
+    async def _reconcile_loop(self, interval: float):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Order stats reconciliation failed: {str(e)}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,81 @@
+"""
+Keyset Pagination and NDJSON Streaming Helpers
+Pages are ordered by (created_at, id) descending; continuation tokens are
+opaque base64 encodings of the last document's sort key
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import DESCENDING
+
+KEYSET_SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Documents per round trip when streaming a cursor
+STREAM_BATCH_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token cannot be decoded"""
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Continuation token pointing just past ``doc``"""
+    created_at = doc["created_at"]
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    key = {"c": created_at, "i": doc["id"]}
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(key["c"]), str(key["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {str(e)}")
+
+
+def keyset_query(query: Dict[str, Any], token: Optional[str]) -> Dict[str, Any]:
+    """Restrict ``query`` to documents that sort after the cursor position"""
+    if not token:
+        return query
+    created_at, doc_id = decode_cursor(token)
+    after = {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    limit: int,
+    token: Optional[str],
+    projection: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of documents plus the token for the next page (None on the last page)"""
+    docs = await collection.find(
+        keyset_query(query, token), projection or {"_id": 0}
+    ).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def ndjson_stream(cursor) -> AsyncIterator[bytes]:
+    """Serialize documents one line at a time as the Motor cursor yields them"""
+    async for doc in cursor.batch_size(STREAM_BATCH_SIZE):
+        yield (json.dumps(doc, default=_json_default) + "\n").encode()
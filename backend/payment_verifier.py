@@ -6,10 +6,20 @@ Uses FREE blockchain explorer APIs
 
 import httpx
 import logging
-from typing import Dict, Optional, Tuple
+import os
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timezone
 from decimal import Decimal
 
+from cassette import Cassette, CassetteTransport
+from metrics import PAYMENT_VERIFICATION_DURATION, VERIFICATIONS_IN_FLIGHT
+from provider_client import ProviderClient, ProviderUnavailable
+from request_batcher import MicroBatcher
+from rpc_pool import RpcPool
+from tracing import span
+from tx_cache import TransactionCache
+
 logger = logging.getLogger(__name__)
 
 # Wallet addresses from the app
@@ -30,17 +40,118 @@ USDT_TRC20_CONTRACT = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"  # USDT on Tron
 USDT_ETH_CONTRACT = "0xdac17f958d2ee523a2206206994597c13d831ec7"  # USDT on Ethereum
 USDT_BSC_CONTRACT = "0x55d398326f99059fF775485246999027B3197955"  # USDT on BSC
 
+# Confirmations after which a UTXO transaction is treated as final for caching
+UTXO_FINAL_CONFIRMATIONS = 6
+
+
+def _rpc_urls(env_name: str, default: str) -> List[str]:
+    return [url.strip() for url in os.environ.get(env_name, default).split(",") if url.strip()]
+
+
+# Explorer API base URLs, overridable to point at a mirror or the benchmark mock
+TRONSCAN_API_URL = os.environ.get("TRONSCAN_API_URL", "https://apilist.tronscanapi.com").rstrip("/")
+BLOCKCYPHER_API_URL = os.environ.get("BLOCKCYPHER_API_URL", "https://api.blockcypher.com").rstrip("/")
+
+# Public RPC endpoint pools (free), overridable with comma-separated lists
+EVM_RPC_URLS = {
+    "eth": _rpc_urls("ETH_RPC_URLS", "https://eth.public-rpc.com,https://ethereum-rpc.publicnode.com"),
+    "bsc": _rpc_urls("BSC_RPC_URLS", "https://bsc-dataseed.binance.org,https://bsc-dataseed1.defibit.io")
+}
+SOLANA_RPC_URLS = _rpc_urls("SOLANA_RPC_URLS", "https://api.mainnet-beta.solana.com,https://solana-rpc.publicnode.com")
+
+# Seconds before an RPC call is hedged to a second endpoint, until the
+# endpoint has enough samples to use its own p95
+RPC_HEDGE_DELAY = float(os.environ.get("RPC_HEDGE_DELAY", "1.0"))
+
+# How long a lookup waits for others to share its batch request
+BATCH_WINDOW_MS = float(os.environ.get("VERIFIER_BATCH_WINDOW_MS", "25"))
+
+# Provider family that serves each payment method; used to cap concurrent
+# outbound calls per upstream API
+PROVIDER_FAMILIES = {
+    "TRX": "tron",
+    "USDT_TRC20": "tron",
+    "BTC": "blockcypher",
+    "LTC": "blockcypher",
+    "ETH": "evm_rpc",
+    "USDT_ETH": "evm_rpc",
+    "USDT_BSC": "evm_rpc",
+    "BNB": "evm_rpc",
+    "SOL": "solana"
+}
+
+
+def provider_family(payment_method: str) -> Optional[str]:
+    """Return the provider family used to verify a payment method"""
+    return PROVIDER_FAMILIES.get(payment_method)
+
 
 class PaymentVerifier:
     """Verify cryptocurrency payments using free blockchain APIs"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    def __init__(self, mode: Optional[str] = None, cassette_path: Optional[str] = None):
+        # live talks to the providers; record also saves their responses to a
+        # cassette and replay serves them back from it without network access
+        self.mode = mode or os.environ.get("PAYMENT_VERIFIER_MODE", "live")
+        self.cassette: Optional[Cassette] = None
+        transport = None
+        if self.mode != "live":
+            self.cassette = Cassette(
+                cassette_path or os.environ.get("PAYMENT_VERIFIER_CASSETTE", "verifier_cassette.jsonl.gz")
+            )
+            aliases = {url: chain for chain, urls in EVM_RPC_URLS.items() for url in urls}
+            aliases.update({url: "sol" for url in SOLANA_RPC_URLS})
+            transport = CassetteTransport(self.cassette, self.mode, aliases)
+        self.client = httpx.AsyncClient(timeout=30.0, transport=transport)
+        
+        # Replayed responses cost nothing, so provider quotas are not enforced
+        def quota(limits):
+            return [] if self.mode == "replay" else limits
+        
+        # One outbound lane per upstream API, rate limited to its free-tier quota
+        self.providers = {
+            "tronscan": ProviderClient("TronScan", self.client, rate_limits=quota([(5.0, 5.0)])),
+            # BlockCypher free tier: 3 requests/second and 100 requests/hour
+            "blockcypher": ProviderClient(
+                "BlockCypher", self.client, rate_limits=quota([(3.0, 3.0), (100 / 3600, 100.0)])
+            ),
+        }
+        # JSON-RPC chains spread over endpoint pools, each endpoint with its own lane
+        self.rpc_pools = {
+            "eth": RpcPool("Ethereum RPC", EVM_RPC_URLS["eth"], self.client, quota([(10.0, 20.0)]), RPC_HEDGE_DELAY),
+            "bsc": RpcPool("BSC RPC", EVM_RPC_URLS["bsc"], self.client, quota([(10.0, 20.0)]), RPC_HEDGE_DELAY),
+            # Solana mainnet-beta: 100 requests per 10 seconds, 40 per method
+            "sol": RpcPool("Solana RPC", SOLANA_RPC_URLS, self.client, quota([(4.0, 10.0)]), RPC_HEDGE_DELAY)
+        }
+        # Raw provider payloads keyed by (chain, tx_hash); bind a collection to persist finalized ones
+        self.cache = TransactionCache()
+        # Cache misses from concurrent verifications are coalesced into one
+        # provider-native batch per chain. TronScan has no multi-hash lookup,
+        # so Tron stays one request per transaction.
+        window = 0 if self.mode == "replay" else BATCH_WINDOW_MS / 1000
+        self.batchers = {
+            "eth": MicroBatcher("eth", lambda hashes: self._evm_batch("eth", hashes), window, max_batch=20),
+            "bsc": MicroBatcher("bsc", lambda hashes: self._evm_batch("bsc", hashes), window, max_batch=20),
+            "sol": MicroBatcher("sol", self._solana_batch, window, max_batch=10),
+            # BlockCypher bills every hash in a batch against the 3/second quota
+            "btc": MicroBatcher("btc", lambda hashes: self._blockcypher_batch("btc", hashes), window, max_batch=3),
+            "ltc": MicroBatcher("ltc", lambda hashes: self._blockcypher_batch("ltc", hashes), window, max_batch=3)
+        }
     
     async def close(self):
         """Close HTTP client"""
         await self.client.aclose()
     
+    def provider_stats(self) -> Dict[str, Dict]:
+        """Request counters and circuit state for each provider and RPC pool endpoint"""
+        stats = {name: provider.stats() for name, provider in self.providers.items()}
+        stats.update({f"{chain}_rpc": pool.stats() for chain, pool in self.rpc_pools.items()})
+        return stats
+    
+    def batch_stats(self) -> Dict[str, Dict]:
+        """Lookups, batches sent and requests per lookup for each batched chain"""
+        return {chain: batcher.stats() for chain, batcher in self.batchers.items()}
+    
     async def verify_payment(
         self, 
         transaction_hash: str, 
@@ -53,43 +164,66 @@ class PaymentVerifier:
         
         Returns: (success, message, transaction_details)
         """
+        # Unknown methods share a label so arbitrary input cannot create new series
+        method_label = payment_method if payment_method in PROVIDER_FAMILIES else "unsupported"
+        in_flight = VERIFICATIONS_IN_FLIGHT.labels(method_label)
+        outcome = "error"
+        started = time.perf_counter()
+        in_flight.inc()
         try:
-            if payment_method in ["TRX", "USDT_TRC20"]:
-                return await self._verify_tron_transaction(
-                    transaction_hash, payment_method, expected_amount, wallet_address
-                )
-            elif payment_method in ["BTC", "LTC"]:
-                return await self._verify_bitcoin_transaction(
-                    transaction_hash, expected_amount, wallet_address, payment_method
-                )
-            elif payment_method in ["ETH", "USDT_ETH", "USDT_BSC", "BNB", "SOL"]:
-                return await self._verify_eth_based_transaction(
-                    transaction_hash, payment_method, expected_amount, wallet_address
-                )
-            else:
-                return False, f"Unsupported payment method: {payment_method}", None
-                
+            with span("payment.verify", payment_method=payment_method, tx_hash=transaction_hash) as s:
+                result = await self._dispatch(transaction_hash, payment_method, expected_amount, wallet_address)
+                outcome = "verified" if result[0] else "rejected"
+                s.set(outcome=outcome, message=result[1])
+            if self.mode == "record":
+                # Replay runs re-check these verdicts against the recorded responses
+                self.cassette.add_verification({
+                    "transaction_hash": transaction_hash,
+                    "payment_method": payment_method,
+                    "expected_amount": expected_amount,
+                    "wallet_address": wallet_address
+                }, result)
+            return result
+        
+        except ProviderUnavailable as e:
+            outcome = "unavailable"
+            logger.warning(f"Payment verification deferred: {str(e)}")
+            return False, str(e), None
         except Exception as e:
             logger.error(f"Payment verification error: {str(e)}")
             return False, f"Verification error: {str(e)}", None
+        finally:
+            in_flight.dec()
+            PAYMENT_VERIFICATION_DURATION.labels(method_label, outcome).observe(time.perf_counter() - started)
+    
+    async def _dispatch(
+        self, transaction_hash: str, payment_method: str, expected_amount: float, wallet_address: str
+    ) -> Tuple[bool, str, Optional[Dict]]:
+        """Route a verification to the checker for its network"""
+        if payment_method in ["TRX", "USDT_TRC20"]:
+            return await self._verify_tron_transaction(
+                transaction_hash, payment_method, expected_amount, wallet_address
+            )
+        elif payment_method in ["BTC", "LTC"]:
+            return await self._verify_bitcoin_transaction(
+                transaction_hash, expected_amount, wallet_address, payment_method
+            )
+        elif payment_method in ["ETH", "USDT_ETH", "USDT_BSC", "BNB", "SOL"]:
+            return await self._verify_eth_based_transaction(
+                transaction_hash, payment_method, expected_amount, wallet_address
+            )
+        else:
+            return False, f"Unsupported payment method: {payment_method}", None
     
     async def _verify_tron_transaction(
         self, tx_hash: str, payment_method: str, expected_amount: float, wallet_address: str
     ) -> Tuple[bool, str, Optional[Dict]]:
         """Verify Tron-based transactions (TRC20 USDT, TRX) using TronScan API"""
         try:
-            # TronScan API - Free, no key required
-            url = f"https://apilist.tronscanapi.com/api/transaction-info?hash={tx_hash}"
-            
-            response = await self.client.get(url)
-            
-            if response.status_code != 200:
-                return False, "Transaction not found on Tron network", None
-            
-            data = response.json()
+            data = await self._fetch_tron(tx_hash)
             
             if not data:
-                return False, "Transaction not found", None
+                return False, "Transaction not found on Tron network", None
             
             # Check if transaction is confirmed
             confirmed = data.get("confirmed", False)
@@ -155,6 +289,8 @@ class PaymentVerifier:
                 
                 return True, "TRX payment verified successfully", tx_details
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Tron verification error: {str(e)}")
             return False, f"Tron verification failed: {str(e)}", None
@@ -164,23 +300,18 @@ class PaymentVerifier:
     ) -> Tuple[bool, str, Optional[Dict]]:
         """Verify Bitcoin/Litecoin transactions using BlockCypher API (free tier)"""
         try:
-            # BlockCypher API - Free tier, no key required
             if coin_type == "LTC":
-                url = f"https://api.blockcypher.com/v1/ltc/main/txs/{tx_hash}"
                 min_amount = 0.001  # Minimum 0.001 LTC
                 coin_name = "Litecoin"
             else:
-                url = f"https://api.blockcypher.com/v1/btc/main/txs/{tx_hash}"
                 min_amount = 0.0001  # Minimum 0.0001 BTC
                 coin_name = "Bitcoin"
             
-            response = await self.client.get(url)
+            data = await self._fetch_blockcypher(coin_type.lower(), tx_hash)
             
-            if response.status_code != 200:
+            if not data:
                 return False, f"{coin_name} transaction not found", None
             
-            data = response.json()
-            
             # Check confirmations
             confirmations = data.get("confirmations", 0)
             if confirmations < 1:
@@ -212,6 +343,8 @@ class PaymentVerifier:
             
             return False, f"No payment found to specified {coin_name} address", None
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"{coin_type} verification error: {str(e)}")
             return False, f"{coin_type} verification failed: {str(e)}", None
@@ -225,42 +358,25 @@ class PaymentVerifier:
             if payment_method == "SOL":
                 return await self._verify_solana_transaction(tx_hash, expected_amount, wallet_address)
             
-            # Use public RPC endpoints (free)
             if payment_method in ["ETH", "USDT_ETH"]:
-                rpc_url = "https://eth.public-rpc.com"
+                chain = "eth"
             elif payment_method in ["USDT_BSC", "BNB"]:
-                rpc_url = "https://bsc-dataseed.binance.org"
+                chain = "bsc"
             else:
                 return False, "Unsupported network", None
             
-            # Get transaction receipt
-            payload = {
-                "jsonrpc": "2.0",
-                "method": "eth_getTransactionByHash",
-                "params": [tx_hash],
-                "id": 1
-            }
+            data = await self._fetch_evm(chain, tx_hash)
             
-            response = await self.client.post(rpc_url, json=payload)
-            
-            if response.status_code != 200:
+            if data is None:
                 return False, "Failed to query blockchain", None
             
-            result = response.json().get("result")
+            result = data.get("tx")
             
             if not result:
                 return False, "Transaction not found", None
             
             # Check transaction receipt for confirmation
-            receipt_payload = {
-                "jsonrpc": "2.0",
-                "method": "eth_getTransactionReceipt",
-                "params": [tx_hash],
-                "id": 1
-            }
-            
-            receipt_response = await self.client.post(rpc_url, json=receipt_payload)
-            receipt = receipt_response.json().get("result")
+            receipt = data.get("receipt")
             
             if not receipt:
                 return False, "Transaction not yet confirmed", None
@@ -309,6 +425,8 @@ class PaymentVerifier:
             
             return True, f"{payment_method} transaction confirmed", tx_details
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"ETH/BSC verification error: {str(e)}")
             return False, f"Verification failed: {str(e)}", None
@@ -318,25 +436,12 @@ class PaymentVerifier:
     ) -> Tuple[bool, str, Optional[Dict]]:
         """Verify Solana transactions using public RPC"""
         try:
-            # Solana public RPC endpoint
-            rpc_url = "https://api.mainnet-beta.solana.com"
+            data = await self._fetch_solana(tx_hash)
             
-            payload = {
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "getTransaction",
-                "params": [
-                    tx_hash,
-                    {"encoding": "json", "maxSupportedTransactionVersion": 0}
-                ]
-            }
-            
-            response = await self.client.post(rpc_url, json=payload)
-            
-            if response.status_code != 200:
+            if data is None:
                 return False, "Failed to query Solana blockchain", None
             
-            result = response.json().get("result")
+            result = data.get("tx")
             
             if not result:
                 return False, "Solana transaction not found", None
@@ -356,10 +461,133 @@ class PaymentVerifier:
             
             return True, "Solana payment confirmed", tx_details
             
+        except ProviderUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Solana verification error: {str(e)}")
             return False, f"Solana verification failed: {str(e)}", None
 
 
+    # Provider lookups. Each returns the raw payload the verifiers parse and
+    # goes through the transaction cache, so repeat checks stay in-process.
+    
+    async def _fetch_tron(self, tx_hash: str) -> Optional[Dict]:
+        """TronScan transaction info; None when the transaction is unknown"""
+        with span("tx.lookup", chain="tron", tx_hash=tx_hash) as s:
+            hit, data = await self.cache.get("tron", tx_hash)
+            s.set(cache_hit=hit)
+        if hit:
+            return data
+        
+        # TronScan API - Free, no key required
+        url = f"{TRONSCAN_API_URL}/api/transaction-info?hash={tx_hash}"
+        response = await self.providers["tronscan"].get(url)
+        data = (response.json() or None) if response.status_code == 200 else None
+        
+        await self.cache.put("tron", tx_hash, data, finalized=bool(data and data.get("confirmed")))
+        return data
+    
+    async def _fetch_blockcypher(self, coin: str, tx_hash: str) -> Optional[Dict]:
+        """BlockCypher transaction for ``coin`` (btc or ltc); None when unknown"""
+        with span("tx.lookup", chain=coin, tx_hash=tx_hash) as s:
+            hit, data = await self.cache.get(coin, tx_hash)
+            s.set(cache_hit=hit)
+        if hit:
+            return data
+        
+        data = await self.batchers[coin].submit(tx_hash)
+        
+        finalized = bool(data and data.get("confirmations", 0) >= UTXO_FINAL_CONFIRMATIONS)
+        await self.cache.put(coin, tx_hash, data, finalized=finalized)
+        return data
+    
+    async def _fetch_evm(self, chain: str, tx_hash: str) -> Optional[Dict]:
+        """Transaction and receipt from an ETH/BSC public RPC as {"tx", "receipt"}; None if the RPC failed"""
+        with span("tx.lookup", chain=chain, tx_hash=tx_hash) as s:
+            hit, data = await self.cache.get(chain, tx_hash)
+            s.set(cache_hit=hit)
+        if hit:
+            return data
+        
+        data = await self.batchers[chain].submit(tx_hash)
+        if data is None:
+            return None
+        
+        await self.cache.put(chain, tx_hash, data, finalized=bool(data["receipt"]))
+        return data
+    
+    async def _fetch_solana(self, tx_hash: str) -> Optional[Dict]:
+        """Solana transaction as {"tx"}; None if the RPC failed"""
+        with span("tx.lookup", chain="sol", tx_hash=tx_hash) as s:
+            hit, data = await self.cache.get("sol", tx_hash)
+            s.set(cache_hit=hit)
+        if hit:
+            return data
+        
+        data = await self.batchers["sol"].submit(tx_hash)
+        if data is None:
+            return None
+        
+        # getTransaction defaults to "finalized" commitment
+        await self.cache.put("sol", tx_hash, data, finalized=bool(data["tx"]))
+        return data
+    
+    # Batch senders used by the micro-batchers. Each maps tx_hash -> payload;
+    # hashes left out resolve to None, the same as a failed single lookup.
+    
+    async def _blockcypher_batch(self, coin: str, hashes: List[str]) -> Dict[str, Dict]:
+        """Up to three transactions in one request via BlockCypher's ``txs/h1;h2;h3``"""
+        # BlockCypher API - Free tier, no key required
+        url = f"{BLOCKCYPHER_API_URL}/v1/{coin}/main/txs/{';'.join(hashes)}"
+        response = await self.providers["blockcypher"].get(url, weight=len(hashes))
+        if response.status_code != 200:
+            return {}
+        payload = response.json()
+        # A single hash returns the object itself; unknown hashes come back as {"error": ...}
+        txs = payload if isinstance(payload, list) else [payload]
+        return {tx["hash"]: tx for tx in txs if isinstance(tx, dict) and tx.get("hash")}
+    
+    async def _evm_batch(self, chain: str, hashes: List[str]) -> Dict[str, Dict]:
+        """Transactions and receipts for ``hashes`` in a single JSON-RPC batch"""
+        calls = []
+        for i, tx_hash in enumerate(hashes):
+            calls.append({"jsonrpc": "2.0", "method": "eth_getTransactionByHash", "params": [tx_hash], "id": 2 * i})
+            calls.append({"jsonrpc": "2.0", "method": "eth_getTransactionReceipt", "params": [tx_hash], "id": 2 * i + 1})
+        response = await self.rpc_pools[chain].post(calls)
+        results = _rpc_results(response.json())
+        
+        batch = {}
+        for i, tx_hash in enumerate(hashes):
+            if 2 * i in results:
+                batch[tx_hash] = {"tx": results[2 * i], "receipt": results.get(2 * i + 1)}
+        return batch
+    
+    async def _solana_batch(self, hashes: List[str]) -> Dict[str, Dict]:
+        """Solana transactions for ``hashes`` in a single JSON-RPC batch"""
+        calls = [
+            {
+                "jsonrpc": "2.0",
+                "id": i,
+                "method": "getTransaction",
+                "params": [
+                    tx_hash,
+                    {"encoding": "json", "maxSupportedTransactionVersion": 0}
+                ]
+            }
+            for i, tx_hash in enumerate(hashes)
+        ]
+        # Solana meters every call in a batch
+        response = await self.rpc_pools["sol"].post(calls, weight=len(hashes))
+        results = _rpc_results(response.json())
+        return {tx_hash: {"tx": results[i]} for i, tx_hash in enumerate(hashes) if i in results}
+
+
+def _rpc_results(replies) -> Dict[int, Optional[Dict]]:
+    """Result of each successful call in a JSON-RPC batch response, keyed by id"""
+    # Replies may arrive in any order; calls that errored carry "error" instead of "result"
+    if not isinstance(replies, list):
+        return {}
+    return {reply["id"]: reply["result"] for reply in replies if isinstance(reply, dict) and "result" in reply}
+
 # Global instance
 payment_verifier = PaymentVerifier()
@@ -0,0 +1,228 @@
+"""
+Resilient Outbound Client for Blockchain Explorer APIs
+Wraps a shared httpx client with per-provider token-bucket rate limits,
+jittered exponential retries and a circuit breaker
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from metrics import PROVIDER_REJECTIONS, PROVIDER_REQUEST_DURATION
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is rate limited, failing or short-circuited"""
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, max_wait: float, tokens: float = 1) -> bool:
+        """Take ``tokens`` tokens, waiting up to ``max_wait`` seconds; False if that is not enough"""
+        # A request can never need more than a full bucket
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            if self.tokens < tokens:
+                wait = (tokens - self.tokens) / self.rate
+                if wait > max_wait:
+                    return False
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= tokens
+            return True
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"  # closed, open, half_open
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def abandon_trial(self):
+        """Reopen after a trial call ended without an outcome, letting the next call try again"""
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.reset_timeout
+
+
+class ProviderClient:
+    """Outbound HTTP access to a single provider with rate limiting, retries and circuit breaking"""
+
+    def __init__(
+        self,
+        name: str,
+        client: httpx.AsyncClient,
+        rate_limits: List[Tuple[float, float]],
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_queue_wait: float = 5.0,
+        timeout: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.client = client
+        # Every (rate per second, burst) pair must grant a token, e.g. per-second and per-hour quotas
+        self.buckets = [TokenBucket(rate, burst) for rate, burst in rate_limits]
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queue_wait = max_queue_wait
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "responses": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "transport_errors": 0,
+            "throttled": 0,
+            "short_circuited": 0,
+            "failures": 0
+        }
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method: str, url: str, weight: int = 1, **kwargs) -> httpx.Response:
+        """Send a request, retrying retryable failures; raises ProviderUnavailable when giving up
+
+        ``weight`` is how many calls the provider bills the request as, e.g. the
+        number of hashes in a batch for providers that count each one.
+        """
+        # Throttle first, so a throttled call never takes the half-open trial
+        await self._take_token(weight)
+        if not self.breaker.allow():
+            self.counters["short_circuited"] += 1
+            PROVIDER_REJECTIONS.labels(self.name, "circuit_open").inc()
+            raise ProviderUnavailable(f"{self.name} is temporarily unavailable, please retry shortly")
+
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            return await self._send(method, url, weight, kwargs)
+        except BaseException:
+            # Cancelled (e.g. the losing attempt of a hedged RPC call) or throttled
+            # before a retry: a trial without an outcome must not hold the circuit half open
+            self.breaker.abandon_trial()
+            raise
+
+    async def _send(self, method: str, url: str, weight: int, kwargs: Dict) -> httpx.Response:
+        last_error = "no response"
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await self._take_token(weight)
+            self.counters["requests"] += 1
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                with span("provider.request", provider=self.name, method=method, url=url, attempt=attempt) as s:
+                    response = await self.client.request(method, url, **kwargs)
+                    s.set(status_code=response.status_code)
+            except httpx.TransportError as e:
+                self.counters["transport_errors"] += 1
+                self._observe(started, "transport_error")
+                last_error = f"{type(e).__name__}"
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self.counters["responses"] += 1
+                    self._observe(started, "ok" if response.status_code < 400 else "client_error")
+                    self.breaker.record_success()
+                    return response
+                if response.status_code == 429:
+                    self.counters["rate_limited"] += 1
+                    self._observe(started, "rate_limited")
+                    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                else:
+                    self.counters["server_errors"] += 1
+                    self._observe(started, "server_error")
+                last_error = f"HTTP {response.status_code}"
+
+            if attempt == self.max_retries:
+                break
+            self.counters["retries"] += 1
+            # Full jitter keeps concurrent retries from hitting the provider in lockstep
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            await asyncio.sleep(max(delay, retry_after or 0))
+
+        self.counters["failures"] += 1
+        self.breaker.record_failure()
+        logger.warning(f"{self.name} request failed after {self.max_retries + 1} attempts: {last_error}")
+        raise ProviderUnavailable(f"{self.name} is not responding ({last_error}), please retry shortly")
+
+    async def _take_token(self, weight: int = 1):
+        for bucket in self.buckets:
+            if not await bucket.acquire(self.max_queue_wait, weight):
+                self.counters["throttled"] += 1
+                PROVIDER_REJECTIONS.labels(self.name, "rate_limit").inc()
+                raise ProviderUnavailable(f"{self.name} rate limit reached, please retry shortly")
+
+    def _observe(self, started: float, outcome: str):
+        PROVIDER_REQUEST_DURATION.labels(self.name, outcome).observe(time.perf_counter() - started)
+
+    def stats(self) -> Dict:
+        """Counters and circuit state for monitoring"""
+        return {
+            **self.counters,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures
+        }
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return min(float(value), 30.0)
+    except ValueError:
+        return None
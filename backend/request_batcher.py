@@ -0,0 +1,75 @@
+"""
+Micro-Batching of Provider Lookups
+Coalesces lookups issued by concurrent verifications into a single
+provider-native batch request (JSON-RPC arrays, multi-hash endpoints)
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from tracing import span
+
+# Sends one batch and returns a result per key; keys missing from the result resolve to None
+BatchSender = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class MicroBatcher:
+    """Collects keys for up to ``window`` seconds (or ``max_batch`` keys) and sends them together
+
+    Identical keys submitted while a batch is open share one slot and one result.
+    """
+
+    def __init__(self, name: str, send_batch: BatchSender, window: float = 0.025, max_batch: int = 20):
+        self.name = name
+        self.send_batch = send_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.counters = {"lookups": 0, "coalesced": 0, "batches": 0}
+
+    async def submit(self, key: Hashable) -> Any:
+        self.counters["lookups"] += 1
+        future = self._pending.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = future
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self.counters["batches"] += 1
+            asyncio.create_task(self._send(batch))
+
+    async def _send(self, batch: Dict[Hashable, asyncio.Future]):
+        try:
+            # Traced under the lookup that opened the batch
+            with span("batch.send", batcher=self.name, size=len(batch)):
+                results = await self.send_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "requests_per_lookup": round(batches / self.counters["lookups"], 3) if self.counters["lookups"] else None
+        }
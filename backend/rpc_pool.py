@@ -0,0 +1,167 @@
+"""
+Multi-Endpoint JSON-RPC Pools
+Routes each chain's RPC calls to the fastest healthy endpoint, tracked by
+EWMA latency and error rate, and hedges calls that run past the endpoint's p95
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from provider_client import ProviderClient, ProviderUnavailable
+from tracing import span
+
+# Weight of the newest sample in the latency and error-rate averages
+EWMA_ALPHA = 0.2
+# Endpoints failing more often than this are only used when nothing better is left
+MAX_ERROR_RATE = 0.5
+# Seconds of latency an endpoint is charged per unit of error rate when ranking
+ERROR_PENALTY = 1.0
+# Latency samples kept per endpoint for the p95 hedge threshold
+LATENCY_WINDOW = 100
+MIN_HEDGE_SAMPLES = 20
+
+
+class Endpoint:
+    """One RPC URL with its own rate limits, circuit breaker and latency statistics"""
+
+    def __init__(self, url: str, provider: ProviderClient):
+        self.url = url
+        self.provider = provider
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, latency: float, ok: bool):
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.samples.append(latency)
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+
+    def record_cancelled(self, elapsed: float):
+        """Lost a hedge race after ``elapsed`` seconds: at least that slow, but not an error"""
+        if self.latency is None or self.latency < elapsed:
+            self.latency = elapsed if self.latency is None else self.latency + EWMA_ALPHA * (elapsed - self.latency)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def rank(self) -> Tuple[bool, bool, float]:
+        """Sort key: available first, then healthy, then fastest (unmeasured endpoints get tried early)"""
+        unhealthy = self.error_rate > MAX_ERROR_RATE
+        score = (self.latency or 0.0) + self.error_rate * ERROR_PENALTY
+        return (self.provider.breaker.state == "open", unhealthy, score)
+
+    def stats(self) -> Dict:
+        p95 = self.p95()
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            **self.provider.stats()
+        }
+
+
+class RpcPool:
+    """Endpoint pool for one chain with latency-based selection, failover and hedged requests
+
+    A call goes to the best-ranked endpoint. If it has not answered within that
+    endpoint's p95 latency (``hedge_delay`` until enough samples exist), the same
+    call is also sent to the next endpoint and the first good answer wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        urls: List[str],
+        client: httpx.AsyncClient,
+        rate_limits: List[Tuple[float, float]],
+        hedge_delay: float = 1.0,
+        min_hedge_delay: float = 0.05
+    ):
+        if not urls:
+            raise ValueError(f"{name} needs at least one RPC endpoint")
+        self.name = name
+        # Failover between endpoints replaces most per-endpoint retries
+        self.endpoints = [
+            Endpoint(url, ProviderClient(f"{name} ({url})", client, rate_limits, max_retries=1))
+            for url in urls
+        ]
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    async def post(self, json, weight: int = 1) -> httpx.Response:
+        """POST a JSON-RPC payload; raises ProviderUnavailable when every endpoint failed"""
+        with span("rpc.call", pool=self.name) as s:
+            response, endpoint, hedged = await self._post(json, weight)
+            s.set(endpoint=endpoint.url, hedged=hedged)
+            return response
+
+    async def _post(self, json, weight: int) -> Tuple[httpx.Response, Endpoint, bool]:
+        self.counters["calls"] += 1
+        candidates = sorted(self.endpoints, key=Endpoint.rank)
+        primary = candidates.pop(0)
+        running = {asyncio.create_task(self._attempt(primary, json, weight)): primary}
+        last_error: Optional[Exception] = None
+        hedged = False
+        try:
+            while running:
+                timeout = None
+                if not hedged and candidates:
+                    timeout = max(primary.p95() or self.hedge_delay, self.min_hedge_delay)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Primary is past its p95: race the next endpoint against it
+                    hedged = True
+                    self.counters["hedged"] += 1
+                    endpoint = candidates.pop(0)
+                    running[asyncio.create_task(self._attempt(endpoint, json, weight))] = endpoint
+                    continue
+
+                for task in done:
+                    endpoint = running.pop(task)
+                    try:
+                        response = task.result()
+                    except ProviderUnavailable as e:
+                        last_error = e
+                        if candidates:
+                            # Fail over to the next endpoint right away
+                            self.counters["failovers"] += 1
+                            endpoint = candidates.pop(0)
+                            running[asyncio.create_task(self._attempt(endpoint, json, weight))] = endpoint
+                        continue
+                    if endpoint is not primary and hedged:
+                        self.counters["hedge_wins"] += 1
+                    return response, endpoint, hedged
+        finally:
+            for task in running:
+                task.cancel()
+        raise last_error or ProviderUnavailable(f"{self.name} is not responding, please retry shortly")
+
+    async def _attempt(self, endpoint: Endpoint, json, weight: int) -> httpx.Response:
+        started = time.monotonic()
+        try:
+            response = await endpoint.provider.post(endpoint.url, json=json, weight=weight)
+        except ProviderUnavailable:
+            endpoint.record(time.monotonic() - started, ok=False)
+            raise
+        except asyncio.CancelledError:
+            endpoint.record_cancelled(time.monotonic() - started)
+            raise
+        if response.status_code != 200:
+            endpoint.record(time.monotonic() - started, ok=False)
+            raise ProviderUnavailable(f"{endpoint.provider.name} returned HTTP {response.status_code}")
+        endpoint.record(time.monotonic() - started, ok=True)
+        return response
+
+    def stats(self) -> Dict:
+        return {**self.counters, "endpoints": [endpoint.stats() for endpoint in self.endpoints]}
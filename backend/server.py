@@ -1,8 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Request, Response, Query, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
@@ -10,16 +14,58 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 import secrets
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from payment_verifier import payment_verifier, CRYPTO_WALLETS
+from indexes import UnindexedQueryListener, ensure_indexes
+from fast_json import FAST_RESPONSES, TrustedDocuments
+from idempotency import IdempotencyConflict, IdempotencyStore, request_fingerprint
+from license_index import LicenseIndex
+from license_leases import LeaseSigner
+from metrics import VERIFICATION_JOBS_PENDING, MetricsMiddleware, MongoCommandTimer, metrics_endpoint
+from tracing import MongoSpanListener, TracingMiddleware, trace_store
+from pagination import (
+    DEFAULT_PAGE_SIZE, KEYSET_SORT, MAX_PAGE_SIZE, InvalidCursor, fetch_page, keyset_query, ndjson_stream
+)
+from catalog_cache import CatalogCache
+from trade_history import compute_performance, iter_trade_chunks, read_trade_history, trade_documents
+from equity_curve import EquityCurveCache, build_curve, downsample_series
+import numpy as np
+from order_stats import OrderStats
+from order_events import FINAL_STATUSES, OrderEventHub, order_event_stream
+from order_export import csv_stream, export_query, parquet_stream, parse_columns, pq
+from verification_jobs import VerificationJobQueue, VerificationQueueFull, verify_orders_concurrently
+from wallet_watcher import WalletWatcher
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (datetimes are stored as native BSON dates and read back as UTC)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    event_listeners=[UnindexedQueryListener(), MongoCommandTimer(), MongoSpanListener()]
+)
 db = client[os.environ['DB_NAME']]
 
+# Dashboard counters, maintained incrementally as orders change status
+order_stats = OrderStats(db.order_stats, db.orders)
+idempotency = IdempotencyStore(db.idempotency_keys)
+order_events = OrderEventHub()
+license_index = LicenseIndex(
+    db.orders,
+    float(os.environ.get('LICENSE_INDEX_REFRESH', '300')),
+    sync_interval=float(os.environ.get('LICENSE_INDEX_SYNC', '5'))
+)
+lease_signer = LeaseSigner(
+    os.environ.get('LICENSE_SIGNING_KEY'),
+    ttl=float(os.environ.get('LICENSE_LEASE_TTL', '21600'))
+)
+
+# Pre-serialized storefront responses, invalidated when the catalog changes
+catalog_cache = CatalogCache(ttl=float(os.environ.get('CATALOG_CACHE_TTL', '60')))
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -80,6 +126,18 @@ class OrderCreate(BaseModel):
     payment_method: str  # TRC20_USDT, BEP20_USDT, TRX, BTC, ETH, BNB
     transaction_hash: Optional[str] = None
 
+# Serializers for the opt-in fast response path
+PRODUCT_DOCS = TrustedDocuments(Product)
+ORDER_DOCS = TrustedDocuments(Order)
+
+class BatchVerifyRequest(BaseModel):
+    order_ids: Optional[List[str]] = None
+    verification_status: Optional[str] = None  # e.g. failed, not_verified
+    limit: int = Field(1000, ge=1, le=1000)
+
+class LeaseRenewRequest(BaseModel):
+    license_keys: List[str] = Field(..., min_length=1, max_length=100)
+
 class PerformanceMetric(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -98,21 +156,44 @@ async def root():
     return {"message": "Scalping Bot EA Store API"}
 
 # Product Routes
+async def load_products_snapshot():
+    products, next_cursor = await fetch_page(db.products, {}, DEFAULT_PAGE_SIZE, None)
+    payload = [Product(**product).model_dump(mode="json") for product in products]
+    return payload, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
 @api_router.get("/products", response_model=List[Product])
-async def get_products():
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    for product in products:
-        if isinstance(product['created_at'], str):
-            product['created_at'] = datetime.fromisoformat(product['created_at'])
+async def get_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """List products newest first. Send the X-Next-Cursor header back as `cursor`
+    for the next page, or `stream=true` for every product as NDJSON"""
+    # The storefront's default first page comes from the in-memory snapshot
+    if not cursor and not stream and limit == DEFAULT_PAGE_SIZE:
+        return await catalog_cache.respond("products", load_products_snapshot, request)
+    try:
+        if stream:
+            docs = db.products.find(keyset_query({}, cursor), {"_id": 0}).sort(KEYSET_SORT)
+            return StreamingResponse(ndjson_stream(docs), media_type="application/x-ndjson")
+        products, next_cursor = await fetch_page(db.products, {}, limit, cursor, PRODUCT_DOCS.projection)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if FAST_RESPONSES:
+        return PRODUCT_DOCS.response(products, headers)
+    response.headers.update(headers)
     return products
 
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    product = await db.products.find_one({"id": product_id}, PRODUCT_DOCS.projection)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if isinstance(product['created_at'], str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
+    if FAST_RESPONSES:
+        return PRODUCT_DOCS.response(product)
     return product
 
 @api_router.post("/products", response_model=Product)
@@ -121,14 +202,183 @@ async def create_product(product_input: ProductCreate):
     product_obj = Product(**product_dict)
     
     doc = product_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
     await db.products.insert_one(doc)
+    catalog_cache.invalidate("products")
     return product_obj
 
+# Product trade history ingestion
+TRADE_CHUNK_ROWS = 5000
+
+def next_trade_batch(chunks, product_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Parse the next chunk of a statement into trade documents; None when exhausted"""
+    for trades in chunks:
+        if not trades.empty:
+            return trade_documents(trades, product_id)
+    return None
+
+async def refresh_product_trade_stats(product_id: str, reference_balance: float) -> Dict[str, Any]:
+    """Recompute a product's win rate, daily return and trade count from its stored trades"""
+    pipeline = [
+        {"$match": {"product_id": product_id}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$close_time"}},
+            "trades": {"$sum": 1},
+            "wins": {"$sum": {"$cond": [{"$gt": ["$net_profit", 0]}, 1, 0]}},
+            "net": {"$sum": "$net_profit"}
+        }},
+        {"$group": {
+            "_id": None,
+            "total_trades": {"$sum": "$trades"},
+            "wins": {"$sum": "$wins"},
+            "net": {"$sum": "$net"},
+            "days": {"$sum": 1}
+        }}
+    ]
+    result = await db.trades.aggregate(pipeline).to_list(1)
+    if not result:
+        return {}
+    totals = result[0]
+    stats = {
+        "total_trades": totals["total_trades"],
+        "win_rate": round(totals["wins"] / totals["total_trades"] * 100, 1),
+        # Shown on the storefront as the average daily return
+        "profit_percentage": round(totals["net"] / reference_balance * 100 / totals["days"], 1),
+        "trade_reference_balance": reference_balance
+    }
+    await db.products.update_one({"id": product_id}, {"$set": stats})
+    catalog_cache.invalidate("products")
+    return stats
+
+@api_router.post("/products/{product_id}/trades")
+async def ingest_product_trades(
+    product_id: str,
+    file: UploadFile = File(...),
+    reference_balance: Optional[float] = Form(None)
+):
+    """Ingest an MT4/MT5 statement (CSV or HTML) into a product's trade log and refresh its stats
+
+    The file is parsed in chunks and written with unordered bulk inserts;
+    trades already stored for the product (same ticket) are skipped.
+    """
+    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    balance = reference_balance or product.get("trade_reference_balance") or product["min_deposit"]
+    chunks = iter_trade_chunks(file.file, file.filename or "", chunk_rows=TRADE_CHUNK_ROWS)
+    received = inserted = 0
+    try:
+        while True:
+            # Parsing is CPU-bound; run each chunk off the event loop
+            docs = await run_in_threadpool(next_trade_batch, chunks, product_id)
+            if docs is None:
+                break
+            received += len(docs)
+            try:
+                result = await db.trades.insert_many(docs, ordered=False)
+                inserted += len(result.inserted_ids)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in errors):
+                    raise
+                inserted += e.details.get("nInserted", 0)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        chunks.close()
+    
+    stats = await refresh_product_trade_stats(product_id, balance)
+    equity_curves.invalidate(product_id)
+    return {
+        "product_id": product_id,
+        "received": received,
+        "inserted": inserted,
+        "duplicates": received - inserted,
+        "stats": stats
+    }
+
+# Downsampled equity curves, keyed by (product, resolution, range)
+equity_curves = EquityCurveCache(ttl=float(os.environ.get('EQUITY_CURVE_CACHE_TTL', '60')))
+
+def epoch_ms(value: datetime) -> float:
+    """Milliseconds since the epoch, reading naive datetimes as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp() * 1000
+
+@api_router.get("/products/{product_id}/equity-curve")
+async def get_equity_curve(
+    product_id: str,
+    points: int = Query(300, ge=3, le=5000),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Equity and drawdown series from a product's trade log, downsampled with LTTB for charting"""
+    cache_key = (points, start, end)
+    cached = equity_curves.get(product_id, cache_key)
+    if cached is not None:
+        return cached
+    
+    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    initial_balance = product.get("trade_reference_balance") or product["min_deposit"]
+    
+    # The whole history is needed so equity and running peaks are right inside the range
+    timestamps: List[float] = []
+    net_profit: List[float] = []
+    cursor = db.trades.find(
+        {"product_id": product_id}, {"_id": 0, "close_time": 1, "net_profit": 1}
+    ).sort("close_time", 1).batch_size(5000)
+    async for trade in cursor:
+        timestamps.append(epoch_ms(trade["close_time"]))
+        net_profit.append(trade["net_profit"])
+    
+    timestamps_ms = np.array(timestamps, dtype=np.int64)
+    equity, drawdown = build_curve(np.array(net_profit, dtype=np.float64), initial_balance)
+    in_range = np.ones(len(timestamps_ms), dtype=bool)
+    if start:
+        in_range &= timestamps_ms >= epoch_ms(start)
+    if end:
+        in_range &= timestamps_ms <= epoch_ms(end)
+    
+    curve = {
+        "product_id": product_id,
+        "initial_balance": initial_balance,
+        "total_trades": int(in_range.sum()),
+        "equity": downsample_series(timestamps_ms[in_range], equity[in_range], points),
+        "drawdown": downsample_series(timestamps_ms[in_range], drawdown[in_range], points)
+    }
+    equity_curves.put(product_id, cache_key, curve)
+    return curve
+
 # Order Routes
 @api_router.post("/orders", response_model=Order)
-async def create_order(order_input: OrderCreate):
+async def create_order(
+    order_input: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)
+):
+    """Create an order. Retries sending the same Idempotency-Key get the
+    original order back instead of a duplicate"""
+    if idempotency_key is None:
+        return await insert_order(order_input)
+    
+    async def create():
+        return (await insert_order(order_input)).model_dump(mode="json")
+    
+    try:
+        order, replayed = await idempotency.run(
+            "orders", idempotency_key, request_fingerprint(order_input.model_dump(mode="json")), create
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return order
+
+async def insert_order(order_input: OrderCreate) -> Order:
     # Verify product exists
     product = await db.products.find_one({"id": order_input.product_id}, {"_id": 0})
     if not product:
@@ -138,55 +388,81 @@ async def create_order(order_input: OrderCreate):
     license_key = f"EA-{secrets.token_urlsafe(16).upper()}"
     
     order_dict = order_input.model_dump()
+    # USDT orders may omit the hash; the wallet watcher matches them by amount
+    order_dict["transaction_hash"] = (order_dict.get("transaction_hash") or "").strip() or None
     order_obj = Order(**order_dict, license_key=license_key, status="pending")
     
     doc = order_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.orders.insert_one(doc)
+    try:
+        await db.orders.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="This transaction hash is already attached to another order")
+    await order_stats.record_created(order_obj.status, order_obj.amount)
+    license_index.add(doc)
     return order_obj
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders():
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
+async def get_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False
+):
+    """List orders newest first. Send the X-Next-Cursor header back as `cursor`
+    for the next page, or `stream=true` for every order as NDJSON"""
+    try:
+        if stream:
+            docs = db.orders.find(keyset_query({}, cursor), {"_id": 0}).sort(KEYSET_SORT)
+            return StreamingResponse(ndjson_stream(docs), media_type="application/x-ndjson")
+        orders, next_cursor = await fetch_page(db.orders, {}, limit, cursor, ORDER_DOCS.projection)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if FAST_RESPONSES:
+        return ORDER_DOCS.response(orders, headers)
+    response.headers.update(headers)
     return orders
 
+@api_router.get("/orders/{order_id}/events")
+async def stream_order_events(order_id: str):
+    """Server-Sent Events with the order's status, verification_status and
+    verification_message: the current values first, then each change.
+    204 once the order is final, which stops EventSource reconnecting"""
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0, "status": 1})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.get("status") in FINAL_STATUSES:
+        return Response(status_code=204)
+    return StreamingResponse(
+        order_event_stream(order_events, db.orders, order_id),
+        media_type="text/event-stream",
+        # Stop proxies such as nginx from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/orders/{order_id}", response_model=Order)
 async def get_order(order_id: str):
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    order = await db.orders.find_one({"id": order_id}, ORDER_DOCS.projection)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if isinstance(order['created_at'], str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if order.get('verified_at') and isinstance(order['verified_at'], str):
-        order['verified_at'] = datetime.fromisoformat(order['verified_at'])
+    if FAST_RESPONSES:
+        return ORDER_DOCS.response(order)
     return order
 
-# Payment Verification Endpoint
-@api_router.post("/orders/{order_id}/verify")
-async def verify_order_payment(order_id: str):
-    """Verify the payment for an order using blockchain APIs"""
-    # Get the order
+# Payment Verification
+async def run_order_verification(order_id: str) -> Dict[str, Any]:
+    """Verify an order's payment on-chain and store the outcome on the order"""
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+        return {"success": False, "message": "Order not found", "details": None, "order_id": order_id}
     
-    if not order.get("transaction_hash"):
-        raise HTTPException(status_code=400, detail="No transaction hash provided")
+    # Marked here rather than when the job is queued, so the mark can never
+    # land after the outcome of a job that already finished
+    await db.orders.update_one({"id": order_id}, {"$set": {"verification_status": "verifying"}})
+    order_events.publish(order_id, verification_status="verifying")
     
-    # Update status to verifying
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"verification_status": "verifying"}}
-    )
-    
-    # Get the wallet address for this payment method
     wallet_address = CRYPTO_WALLETS.get(order["payment_method"])
-    if not wallet_address:
-        raise HTTPException(status_code=400, detail="Invalid payment method")
     
     # Verify the payment
     success, message, tx_details = await payment_verifier.verify_payment(
@@ -204,13 +480,20 @@ async def verify_order_payment(order_id: str):
     }
     
     if success:
-        update_data["verified_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["verified_at"] = datetime.now(timezone.utc)
         update_data["status"] = "verified"
     
-    await db.orders.update_one(
+    previous = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "status": 1, "amount": 1, "license_key": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    if success and previous:
+        await order_stats.record_transition(previous.get("status"), "verified", previous["amount"])
+        license_index.set_status(previous.get("license_key"), "verified")
+    if previous:
+        order_events.publish(order_id, **{"status": previous.get("status"), **update_data})
     
     return {
         "success": success,
@@ -219,6 +502,84 @@ async def verify_order_payment(order_id: str):
         "order_id": order_id
     }
 
+async def apply_watched_transfer(order: Dict[str, Any], transfer: Dict[str, Any]) -> bool:
+    """Mark a pending order paid by a transfer the wallet watcher found; False if it was not applied"""
+    update_data = {
+        "transaction_hash": transfer["transaction_hash"],
+        "status": "verified",
+        "verification_status": "verified",
+        "verification_message": "Payment detected on the store wallet",
+        "verification_details": transfer,
+        "verified_at": datetime.now(timezone.utc)
+    }
+    try:
+        previous = await db.orders.find_one_and_update(
+            {"id": order["id"], "status": "pending"},
+            {"$set": update_data},
+            projection={"_id": 0, "status": 1, "amount": 1, "license_key": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # The transfer already paid for another order
+        return False
+    if not previous:
+        return False
+    await order_stats.record_transition(previous.get("status"), "verified", previous["amount"])
+    license_index.set_status(previous.get("license_key"), "verified")
+    order_events.publish(order["id"], **update_data)
+    return True
+
+wallet_watcher = WalletWatcher(
+    db.orders,
+    db.wallet_watch_state,
+    db.wallet_transfers,
+    payment_verifier,
+    on_match=apply_watched_transfer,
+    interval=float(os.environ.get('WALLET_WATCH_INTERVAL', '60'))
+)
+
+verification_queue = VerificationJobQueue(
+    db.verification_jobs,
+    handler=run_order_verification,
+    workers=int(os.environ.get('VERIFICATION_WORKERS', '4')),
+    max_pending=int(os.environ.get('VERIFICATION_QUEUE_SIZE', '1000'))
+)
+VERIFICATION_JOBS_PENDING.set_function(verification_queue.pending)
+
+@api_router.post("/orders/{order_id}/verify", status_code=202)
+async def verify_order_payment(order_id: str, response: Response):
+    """Queue blockchain verification of an order's payment and return the job"""
+    # Get the order
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    if not order.get("transaction_hash"):
+        raise HTTPException(status_code=400, detail="No transaction hash provided")
+    
+    if not CRYPTO_WALLETS.get(order["payment_method"]):
+        raise HTTPException(status_code=400, detail="Invalid payment method")
+    
+    try:
+        job = await verification_queue.submit(order_id)
+    except VerificationQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Verification queue is full, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    
+    response.headers["Location"] = f"/api/verification-jobs/{job['id']}"
+    return job
+
+@api_router.get("/verification-jobs/{job_id}")
+async def get_verification_job(job_id: str):
+    """Report the progress and result of a verification job"""
+    job = await verification_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Verification job not found")
+    return job
+
 # Admin: Update order status
 @api_router.patch("/orders/{order_id}/status")
 async def update_order_status(order_id: str, status: str):
@@ -227,16 +588,68 @@ async def update_order_status(order_id: str, status: str):
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    result = await db.orders.update_one(
+    previous = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"status": status}}
+        {"$set": {"status": status}},
+        projection={"_id": 0, "status": 1, "amount": 1, "license_key": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if not previous:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    await order_stats.record_transition(previous.get("status"), status, previous["amount"])
+    license_index.set_status(previous.get("license_key"), status)
+    order_events.publish(order_id, status=status)
+    
     return {"message": "Order status updated", "order_id": order_id, "status": status}
 
+# License validation for EA terminals
+@api_router.get("/licenses/{license_key}/validate")
+async def validate_license(license_key: str, product_id: Optional[str] = None):
+    """Check a license key from an EA terminal; `active` once its order is paid,
+    and only for `product_id` when given. Served from the in-memory license index"""
+    entry = await license_index.lookup(license_key)
+    if not entry:
+        raise HTTPException(status_code=404, detail="License not found")
+    return {
+        "license_key": license_key,
+        "active": entry["active"] and (product_id is None or product_id == entry["product_id"]),
+        "status": entry["status"],
+        "product_id": entry["product_id"]
+    }
+
+@api_router.get("/licenses/public-key")
+async def get_lease_public_key():
+    """Ed25519 public key EA terminals verify lease signatures with"""
+    return lease_signer.public_key()
+
+@api_router.post("/licenses/{license_key}/lease")
+async def issue_license_lease(license_key: str):
+    """Signed lease for a paid order's license, checked offline by the terminal until
+    it expires; renew after `renew_after`"""
+    entry = await license_index.lookup(license_key)
+    if not entry:
+        raise HTTPException(status_code=404, detail="License not found")
+    if not entry["active"]:
+        raise HTTPException(status_code=403, detail=f"Order is {entry['status']}, leases need a verified payment")
+    return lease_signer.issue(license_key, entry)
+
+@api_router.post("/licenses/leases/renew")
+async def renew_license_leases(request: LeaseRenewRequest):
+    """Renew up to 100 leases at once, e.g. for every EA on one terminal"""
+    leases = {}
+    rejected = {}
+    for license_key in dict.fromkeys(request.license_keys):
+        entry = await license_index.lookup(license_key)
+        if not entry:
+            rejected[license_key] = "not_found"
+        elif not entry["active"]:
+            rejected[license_key] = entry["status"]
+        else:
+            leases[license_key] = lease_signer.issue(license_key, entry)
+    return {"leases": leases, "rejected": rejected}
+
 # Admin: Get all orders with filters
 @api_router.get("/admin/orders")
 async def get_all_orders_admin(
@@ -251,74 +664,222 @@ async def get_all_orders_admin(
     if verification_status:
         query["verification_status"] = verification_status
     
+    if FAST_RESPONSES:
+        orders = await db.orders.find(query, ORDER_DOCS.projection).sort("created_at", -1).limit(limit).to_list(limit)
+        return ORDER_DOCS.response(orders)
     orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+    return orders
+
+# Admin: Export orders
+@api_router.get("/admin/orders/export")
+async def export_orders(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    columns: Optional[str] = None,
+    status: Optional[str] = None,
+    verification_status: Optional[str] = None,
+    payment_method: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """Stream every matching order, oldest first, as CSV or Parquet. `columns` is a
+    comma-separated subset; `created_to` is exclusive"""
+    try:
+        selected = parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "parquet" and pq is None:
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the server")
     
-    for order in orders:
-        if isinstance(order.get('created_at'), str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if order.get('verified_at') and isinstance(order['verified_at'], str):
-            order['verified_at'] = datetime.fromisoformat(order['verified_at'])
+    query = export_query(status, verification_status, payment_method, created_from, created_to)
+    # created_at alone keeps the sort on an index for every filter combination
+    docs = db.orders.find(query, {"_id": 0, **{column: 1 for column in selected}}).sort("created_at", 1)
+    filename = f"orders-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "parquet":
+        return StreamingResponse(
+            parquet_stream(docs, selected), media_type="application/vnd.apache.parquet", headers=headers
+        )
+    return StreamingResponse(csv_stream(docs, selected), media_type="text/csv; charset=utf-8", headers=headers)
+
+# Admin: Re-verify many orders at once
+@api_router.post("/admin/orders/verify-batch")
+async def verify_orders_batch(batch: BatchVerifyRequest):
+    """Re-verify orders by ID or verification status, streaming NDJSON results as they finish"""
+    if not batch.order_ids and not batch.verification_status:
+        raise HTTPException(status_code=400, detail="Provide order_ids or verification_status")
     
-    return orders
+    query = {"transaction_hash": {"$nin": [None, ""]}}
+    if batch.order_ids:
+        query["id"] = {"$in": batch.order_ids}
+    if batch.verification_status:
+        query["verification_status"] = batch.verification_status
+    
+    orders = await db.orders.find(
+        query, {"_id": 0, "id": 1, "payment_method": 1, "verification_status": 1}
+    ).limit(batch.limit).to_list(batch.limit)
+    
+    # Orders that already have a verification in flight are left alone
+    orders = [order for order in orders if not verification_queue.is_active(order["id"])]
+    previous_status = {order["id"]: order.get("verification_status", "not_verified") for order in orders}
+    
+    async def verify_one(order_id: str) -> Dict[str, Any]:
+        # Runs once the order's provider family has a free slot; only then is
+        # it registered with the job queue, so cancelled waiters leave nothing behind
+        try:
+            result = await verification_queue.run_inline(order_id, run_order_verification)
+        except asyncio.CancelledError:
+            # Client went away before this order was verified
+            await db.orders.update_one(
+                {"id": order_id, "verification_status": "verifying"},
+                {"$set": {"verification_status": previous_status[order_id]}}
+            )
+            order_events.publish(order_id, verification_status=previous_status[order_id])
+            raise
+        if result is None:
+            return {
+                "success": False,
+                "message": "A verification of this order is already in progress",
+                "details": None,
+                "order_id": order_id
+            }
+        return result
+    
+    async def stream_results():
+        async for result in verify_orders_concurrently(orders, verify_one):
+            yield json.dumps(result, default=str) + "\n"
+    
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Size": str(len(orders))}
+    )
 
 # Get order stats for admin dashboard
 @api_router.get("/admin/stats")
 async def get_admin_stats():
     """Get overview statistics for admin dashboard"""
-    total_orders = await db.orders.count_documents({})
-    pending_orders = await db.orders.count_documents({"status": "pending"})
-    verified_orders = await db.orders.count_documents({"status": "verified"})
-    completed_orders = await db.orders.count_documents({"status": "completed"})
-    
-    # Calculate total revenue from completed orders
-    pipeline = [
-        {"$match": {"status": {"$in": ["verified", "completed"]}}},
-        {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
-    ]
-    revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
-    
+    return await order_stats.read()
+
+@api_router.post("/admin/stats/reconcile")
+async def reconcile_admin_stats():
+    """Recompute dashboard counters from the orders collection, correcting any drift"""
+    await order_stats.reconcile()
+    return await order_stats.read()
+
+# Admin: Outbound provider health
+@api_router.get("/admin/providers")
+async def get_provider_stats():
+    """Request counters, circuit breaker state and batching efficiency for each blockchain API provider"""
     return {
-        "total_orders": total_orders,
-        "pending_orders": pending_orders,
-        "verified_orders": verified_orders,
-        "completed_orders": completed_orders,
-        "total_revenue": total_revenue
+        "providers": payment_verifier.provider_stats(),
+        "batching": payment_verifier.batch_stats(),
+        "transaction_cache": payment_verifier.cache.stats(),
+        "wallet_watcher": wallet_watcher.stats()
     }
 
+# Admin: Request traces
+@api_router.get("/admin/traces")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = 0,
+    name: Optional[str] = None
+):
+    """Recent traces newest first, optionally only slow ones or those whose name contains `name`"""
+    return trace_store.recent(limit, min_duration_ms, name)
+
+@api_router.get("/admin/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Every span of one trace, e.g. from a response's X-Trace-Id header"""
+    trace = trace_store.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
 # Performance Metrics
-@api_router.get("/performance", response_model=PerformanceMetric)
-async def get_performance():
-    metric = await db.performance.find_one({}, {"_id": 0})
-    if not metric:
+# The defaults keep one id so their ETag stays the same across cache rebuilds
+DEFAULT_PERFORMANCE_ID = "default-performance"
+
+def default_performance() -> PerformanceMetric:
+    """Metrics shown until real performance data is posted"""
+    return PerformanceMetric(
+        id=DEFAULT_PERFORMANCE_ID,
+        total_profit=147250.50,
+        monthly_return=18.5,
+        win_rate=87.3,
+        total_trades=2847,
+        avg_trade_duration="3.2 min",
+        max_drawdown=12.4,
+        sharpe_ratio=2.8
+    )
+
+async def load_performance_snapshot():
+    metric = await db.performance.find_one({})
+    if metric:
+        # Records saved without an id get a stable one from their document _id
+        metric.setdefault("id", str(metric.pop("_id")))
+    else:
         # Return default metrics if none exist
-        return PerformanceMetric(
-            total_profit=147250.50,
-            monthly_return=18.5,
-            win_rate=87.3,
-            total_trades=2847,
-            avg_trade_duration="3.2 min",
-            max_drawdown=12.4,
-            sharpe_ratio=2.8
-        )
-    return metric
+        metric = default_performance()
+    return PerformanceMetric.model_validate(metric).model_dump(mode="json"), {}
+
+@api_router.get("/performance", response_model=PerformanceMetric)
+async def get_performance(request: Request):
+    return await catalog_cache.respond("performance", load_performance_snapshot, request)
 
 @api_router.post("/performance", response_model=PerformanceMetric)
 async def create_performance(metric: PerformanceMetric):
     doc = metric.model_dump()
     await db.performance.delete_many({})  # Keep only one performance record
     await db.performance.insert_one(doc)
+    catalog_cache.invalidate("performance")
+    return metric
+
+def performance_from_trade_history(data: bytes, filename: str, initial_balance: Optional[float]) -> Dict[str, Any]:
+    trades = read_trade_history(data, filename)
+    balance = initial_balance or trades.attrs.get("first_deposit")
+    if not balance:
+        raise ValueError("initial_balance is required when the statement has no deposit row")
+    return compute_performance(trades, balance)
+
+@api_router.post("/performance/trades", response_model=PerformanceMetric)
+async def upload_performance_trades(
+    file: UploadFile = File(...),
+    initial_balance: Optional[float] = Form(None)
+):
+    """Recompute performance metrics from an MT4/MT5 trade history export (CSV or HTML)"""
+    data = await file.read()
+    try:
+        # Parsing and the vectorized math are CPU-bound; keep them off the event loop
+        computed = await run_in_threadpool(
+            performance_from_trade_history, data, file.filename or "", initial_balance
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    metric = PerformanceMetric(**computed)
+    doc = metric.model_dump()
+    doc["source"] = "trade_history"
+    doc["computed_at"] = datetime.now(timezone.utc)
+    await db.performance.delete_many({})  # Keep only one performance record
+    await db.performance.insert_one(doc)
+    catalog_cache.invalidate("performance")
     return metric
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Prometheus scrape target, outside /api so it is not exposed through the storefront proxy
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Trace-Id", "Idempotent-Replayed"],
 )
 
 # Configure logging
@@ -330,8 +891,34 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await verification_queue.stop()
+    await wallet_watcher.stop()
+    await license_index.stop()
+    await order_stats.stop_reconciler()
     client.close()
     await payment_verifier.close()
+    await run_in_threadpool(trace_store.close)
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_verification_workers():
+    payment_verifier.cache.bind(db.transaction_cache)
+    await verification_queue.start()
+
+@app.on_event("startup")
+async def start_wallet_watcher():
+    wallet_watcher.start()
+
+@app.on_event("startup")
+async def start_license_index():
+    license_index.start()
+
+@app.on_event("startup")
+async def start_stats_reconciler():
+    order_stats.start_reconciler(float(os.environ.get('STATS_RECONCILE_INTERVAL', '3600')))
 
 # Initialize default product on startup
 @app.on_event("startup")
@@ -419,7 +1006,6 @@ async def init_default_data():
         
         for product in [low_risk_product, moderate_risk_product, high_risk_product]:
             doc = product.model_dump()
-            doc['created_at'] = doc['created_at'].isoformat()
             await db.products.insert_one(doc)
         
         logger.info("Default products created")
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""
+Lightweight In-Process Request Tracing
+One trace per API request or background job, with child spans for MongoDB
+commands and outbound provider calls, kept in a ring buffer and optionally
+appended to a JSONL file
+"""
+
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation inside a trace"""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None, duration: Optional[float] = None):
+        if self.duration_ms is not None:
+            return
+        elapsed = duration if duration is not None else time.perf_counter() - self._started
+        self.duration_ms = round(elapsed * 1000, 3)
+        if error is not None:
+            self.status = "cancelled" if type(error).__name__ == "CancelledError" else "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "offset_ms": round((self.started_at - self.trace.root.started_at) * 1000, 3),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded outside a trace so callers can always call ``set``"""
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans recorded under one trace ID"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, None, attributes)
+
+    def start_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent_id, attributes)
+        # list.append is atomic, so listener threads may add spans concurrently
+        self.spans.append(span)
+        return span
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": datetime.fromtimestamp(self.root.started_at, timezone.utc).isoformat(),
+            "duration_ms": self.root.duration_ms,
+            "status": self.root.status,
+            "span_count": len(self.spans),
+            "spans": [span.to_dict() for span in self.spans]
+        }
+
+
+class TraceStore:
+    """Ring buffer of finished traces, optionally mirrored to a JSONL file
+
+    File writes happen on a background thread so a slow disk never blocks the
+    event loop; if the writer falls ``max_backlog`` traces behind, new traces
+    are kept in memory only.
+    """
+
+    def __init__(self, max_traces: int = 500, path: Optional[str] = None, max_backlog: int = 10000):
+        self.max_traces = max_traces
+        self.path = path
+        self.dropped = 0
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._backlog: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_backlog)
+        self._writer: Optional[threading.Thread] = None
+
+    def add(self, trace: Trace):
+        record = trace.to_dict()
+        with self._lock:
+            self._traces[trace.trace_id] = record
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+            if self.path and self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+        if self.path:
+            try:
+                self._backlog.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Write out the traces still queued for the file"""
+        if self._writer is not None:
+            self._backlog.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+        if self.dropped:
+            logger.warning(f"{self.dropped} traces were not written to {self.path}: the writer fell behind")
+
+    def _write_loop(self):
+        while True:
+            records = [self._backlog.get()]
+            # Drain whatever else is waiting so a burst costs one write
+            while not self._backlog.empty() and len(records) < 1000:
+                records.append(self._backlog.get_nowait())
+            stop = None in records
+            lines = "".join(json.dumps(record, default=str) + "\n" for record in records if record is not None)
+            try:
+                with open(self.path, "a") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.error(f"Writing traces to {self.path} failed: {str(e)}")
+            if stop:
+                return
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        return self._traces.get(trace_id)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest trace summaries first, without their spans"""
+        with self._lock:
+            traces = list(self._traces.values())
+        summaries = []
+        for record in reversed(traces):
+            if (record["duration_ms"] or 0) < min_duration_ms:
+                continue
+            if name and name not in record["name"]:
+                continue
+            summaries.append({key: value for key, value in record.items() if key != "spans"})
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+
+trace_store = TraceStore(int(os.environ.get("TRACE_BUFFER_SIZE", "500")), os.environ.get("TRACE_FILE") or None)
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace.trace_id if span else None
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Span]:
+    """Open a new trace with ``name`` as its root span; stored when the block exits"""
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace.root
+    except BaseException as e:
+        trace.root.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.root.end()
+        trace_store.add(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Any]:
+    """Record a child span of the current span; does nothing outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = parent.trace.start_span(name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a trace per HTTP request and returning its ID as X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with start_trace(f"{scope['method']} {scope['path']}", method=scope["method"], path=scope["path"]) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set(status_code=message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-trace-id", root.trace.trace_id.encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Name the trace after the route template once the router has matched it
+                route = scope.get("route")
+                if route is not None:
+                    root.name = f"{scope['method']} {route.path}"
+
+
+class MongoSpanListener(monitoring.CommandListener):
+    """Adds a span for every MongoDB command issued inside a trace
+
+    Motor runs commands on its executor with a copy of the caller's context,
+    so the listener sees the span that issued the command.
+    """
+
+    def __init__(self):
+        self._spans: Dict[Tuple[int, int], Span] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        field = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(field)
+        child = parent.trace.start_span(
+            f"mongo.{event.command_name}",
+            parent.span_id,
+            {"db.command": event.command_name, "db.collection": collection if isinstance(collection, str) else None}
+        )
+        with self._lock:
+            self._spans[(event.request_id, event.operation_id)] = child
+
+    def succeeded(self, event):
+        self._finish(event, None)
+
+    def failed(self, event):
+        self._finish(event, event.failure)
+
+    def _finish(self, event, failure):
+        with self._lock:
+            child = self._spans.pop((event.request_id, event.operation_id), None)
+        if child is None:
+            return
+        if failure:
+            child.status = "error"
+            child.error = str(failure.get("errmsg", failure)) if isinstance(failure, dict) else str(failure)
+        child.end(duration=event.duration_micros / 1_000_000)
@@ -0,0 +1,337 @@
+"""
+MT4/MT5 Trade History Analytics
+Parses account history exports (CSV or HTML statements), whole or in streamed
+chunks, and computes PerformanceMetric figures with vectorized NumPy/pandas
+"""
+
+import csv
+import io
+import itertools
+from html.parser import HTMLParser
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+
+from equity_curve import build_curve
+
+try:
+    import pyarrow
+    import pyarrow.csv as pa_csv
+except ImportError:  # optional; whole-file CSV parsing falls back to pandas' C parser
+    pyarrow = None
+    pa_csv = None
+
+# Normalized column -> header names used by MT4 and MT5 exports. MT5 repeats
+# "Time" and "Price" for open and close; the second copy gets a ".1" suffix.
+COLUMN_ALIASES = {
+    "ticket": ["ticket", "position", "order", "deal"],
+    "open_time": ["open time", "time"],
+    "close_time": ["close time", "time.1"],
+    "type": ["type"],
+    "symbol": ["symbol", "item"],
+    "profit": ["profit"],
+    "commission": ["commission"],
+    "swap": ["swap"],
+    "taxes": ["taxes"],
+}
+
+MT_TIME_FORMAT = "%Y.%m.%d %H:%M:%S"
+TRADING_DAYS_PER_YEAR = 252
+HTML_READ_SIZE = 64 * 1024
+
+
+class _StatementTableParser(HTMLParser):
+    """Collects the text of every table row in an HTML statement"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[List[str]] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._row is not None and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _dedupe(headers: List[str]) -> List[str]:
+    seen: Dict[str, int] = {}
+    result = []
+    for header in headers:
+        count = seen.get(header, 0)
+        result.append(header if count == 0 else f"{header}.{count}")
+        seen[header] = count + 1
+    return result
+
+
+def _iter_html_frames(text_chunks: Iterable[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Raw trade-table rows from an HTML statement, parsed incrementally as text arrives"""
+    parser = _StatementTableParser()
+    headers: Optional[List[str]] = None
+    header_row: List[str] = []
+    type_column: Optional[int] = None
+    body: List[List[str]] = []
+    yielded = False
+
+    for text in itertools.chain(text_chunks, [None]):
+        if text is None:
+            parser.close()
+        else:
+            parser.feed(text)
+        rows, parser.rows = parser.rows, []
+        for row in rows:
+            lowered = [cell.lower() for cell in row]
+            if headers is None:
+                if "profit" in lowered and any(name in lowered for name in COLUMN_ALIASES["ticket"]):
+                    headers, header_row = _dedupe(lowered), lowered
+                    type_column = headers.index("type") if "type" in headers else None
+                continue
+            if len(row) == len(headers) and lowered != header_row:
+                body.append(row)
+            elif type_column is not None and "balance" in lowered:
+                # MT4 spans balance rows across columns: ticket, time, "balance", comment, amount
+                balance = [""] * len(headers)
+                balance[0] = row[0]
+                balance[type_column] = "balance"
+                balance[headers.index("profit")] = row[-1]
+                body.append(balance)
+            if len(body) >= chunk_rows:
+                yield pd.DataFrame(body, columns=headers)
+                yielded = True
+                body = []
+
+    if headers is None:
+        raise ValueError("No trade table found in HTML statement")
+    if body or not yielded:
+        yield pd.DataFrame(body, columns=headers)
+
+
+def _sniff_delimiter(first_line: str) -> str:
+    try:
+        return csv.Sniffer().sniff(first_line, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+
+def _iter_csv_frames(stream: TextIO, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    first_line = stream.readline()
+    stream.seek(0)
+    delimiter = _sniff_delimiter(first_line)
+    # Only the columns we use are parsed; numeric ones are converted by the C parser
+    wanted = {alias for aliases in COLUMN_ALIASES.values() for alias in aliases}
+    for frame in pd.read_csv(
+        stream, sep=delimiter, usecols=lambda name: name.strip().lower() in wanted, chunksize=chunk_rows
+    ):
+        frame.columns = [column.strip().lower() for column in frame.columns]
+        yield frame
+
+
+def _numeric(column: pd.Series) -> pd.Series:
+    values = pd.to_numeric(column, errors="coerce")
+    # Statements may use spaces as thousands separators, e.g. "1 234.56"; only
+    # the values that failed the fast path go through string cleanup
+    failed = values.isna() & column.notna()
+    if failed.any():
+        values[failed] = pd.to_numeric(
+            column[failed].astype(str).str.replace(r"\s", "", regex=True), errors="coerce"
+        )
+    return values.fillna(0.0)
+
+
+def _labels(column: pd.Series) -> np.ndarray:
+    """Stripped, lower-cased labels, normalizing each distinct value once"""
+    codes, uniques = pd.factorize(column)
+    normalized = np.array([str(value).strip().lower() for value in uniques] + [""], dtype=object)
+    return normalized[codes]
+
+
+def _times(column: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(column, format=MT_TIME_FORMAT, errors="coerce")
+    if parsed.isna().all():
+        parsed = pd.to_datetime(column, errors="coerce")
+    return parsed
+
+
+def normalize_trades(frame: pd.DataFrame) -> pd.DataFrame:
+    """Map an export's columns onto ticket/open_time/close_time/type/symbol/net_profit"""
+    columns = {}
+    for name, aliases in COLUMN_ALIASES.items():
+        match = next((alias for alias in aliases if alias in frame.columns), None)
+        if match is not None:
+            columns[name] = frame[match]
+    missing = {"ticket", "close_time", "type", "profit"} - columns.keys()
+    if missing:
+        raise ValueError(f"Trade history is missing columns: {sorted(missing)}")
+
+    kind = _labels(columns["type"])
+    net = _numeric(columns["profit"])
+    for extra in ("commission", "swap", "taxes"):
+        if extra in columns:
+            net = net + _numeric(columns[extra])
+
+    trades = pd.DataFrame({
+        "ticket": columns["ticket"].astype(str),
+        "open_time": _times(columns["open_time"]) if "open_time" in columns else pd.NaT,
+        "close_time": _times(columns["close_time"]),
+        "type": kind,
+        "symbol": columns["symbol"].astype(str) if "symbol" in columns else "",
+        "net_profit": net,
+    })
+    # Balance rows are deposits and withdrawals; pending-order rows have no fill
+    deposits = trades.loc[trades["type"] == "balance", "net_profit"]
+    trades = trades[trades["type"].isin(["buy", "sell"]) & trades["close_time"].notna()].reset_index(drop=True)
+    trades.attrs["first_deposit"] = float(deposits.iloc[0]) if len(deposits) else None
+    return trades
+
+
+def iter_trade_chunks(fileobj: BinaryIO, filename: str, chunk_rows: int = 10000) -> Iterator[pd.DataFrame]:
+    """Normalized closed trades from an export, ``chunk_rows`` source rows at a time
+
+    Reads ``fileobj`` incrementally so large statements never sit in memory
+    whole. Each chunk carries the first deposit it saw in ``attrs``.
+    """
+    # MT5 writes UTF-16 reports; MT4 and most tools write UTF-8
+    encoding = "utf-16" if fileobj.read(2) in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    fileobj.seek(0)
+    stream = io.TextIOWrapper(fileobj, encoding=encoding, errors="replace", newline="")
+    try:
+        is_html = filename.lower().endswith((".htm", ".html")) or stream.read(512).lstrip().startswith("<")
+        stream.seek(0)
+        if is_html:
+            frames = _iter_html_frames(iter(lambda: stream.read(HTML_READ_SIZE), ""), chunk_rows)
+        else:
+            frames = _iter_csv_frames(stream, chunk_rows)
+        for frame in frames:
+            yield normalize_trades(frame)
+    finally:
+        # Leave the caller's file open
+        stream.detach()
+
+
+def _read_csv_frame(text: str) -> pd.DataFrame:
+    """A whole CSV export in one parse, multithreaded when pyarrow is installed"""
+    first_line = text[:text.find("\n")] if "\n" in text else text
+    delimiter = _sniff_delimiter(first_line)
+    # Named here so repeated MT5 headers get the same ".1" suffix as the chunked reader
+    names = _dedupe([name.strip().lower() for name in next(csv.reader([first_line], delimiter=delimiter))])
+    wanted = {alias for aliases in COLUMN_ALIASES.values() for alias in aliases}
+    usecols = [name for name in names if name in wanted]
+    data = io.BytesIO(text.encode())
+    if pa_csv is None:
+        return pd.read_csv(data, sep=delimiter, header=0, names=names, usecols=usecols)
+    table = pa_csv.read_csv(
+        data,
+        read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=usecols,
+            # Times are parsed here rather than by _times, at the resolution
+            # the chunked reader produces, and tickets are kept as text
+            timestamp_parsers=[MT_TIME_FORMAT, pa_csv.ISO8601],
+            column_types={
+                **{name: pyarrow.string() for name in usecols if name in COLUMN_ALIASES["ticket"]},
+                **{
+                    name: pyarrow.timestamp("us") for name in usecols
+                    if name in COLUMN_ALIASES["open_time"] + COLUMN_ALIASES["close_time"]
+                }
+            }
+        )
+    )
+    return table.to_pandas()
+
+
+def read_trade_history(data: bytes, filename: str) -> pd.DataFrame:
+    """Parse a whole MT4/MT5 export into normalized closed trades
+
+    CSV exports are parsed in a single pass; only HTML statements go through
+    the chunked reader.
+    """
+    encoding = "utf-16" if data[:2] in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+    text = data.decode(encoding, errors="replace")
+    if not (filename.lower().endswith((".htm", ".html")) or text[:512].lstrip().startswith("<")):
+        return normalize_trades(_read_csv_frame(text))
+
+    chunks = list(iter_trade_chunks(io.BytesIO(data), filename))
+    trades = pd.concat(chunks, ignore_index=True)
+    trades.attrs["first_deposit"] = next(
+        (chunk.attrs["first_deposit"] for chunk in chunks if chunk.attrs.get("first_deposit")), None
+    )
+    return trades
+
+
+def trade_documents(trades: pd.DataFrame, product_id: str) -> List[Dict]:
+    """MongoDB documents for a chunk of normalized trades"""
+    records = trades.copy()
+    for column in ("open_time", "close_time"):
+        records[column] = records[column].astype(object).where(records[column].notna(), None)
+    records["product_id"] = product_id
+    return records.to_dict("records")
+
+
+def format_duration(seconds: float) -> str:
+    """Human-readable trade duration, e.g. '3.2 min' or '5.1 h'"""
+    if seconds < 60:
+        return f"{seconds:.0f} sec"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} days"
+
+
+def compute_performance(trades: pd.DataFrame, initial_balance: float) -> Dict:
+    """PerformanceMetric fields computed over the whole trade history"""
+    if trades.empty:
+        raise ValueError("Trade history contains no closed trades")
+    if initial_balance <= 0:
+        raise ValueError("Initial balance must be positive")
+
+    trades = trades.sort_values("close_time", kind="stable")
+    net = trades["net_profit"].to_numpy(dtype=np.float64)
+    # Same curve the equity chart draws; drawdown is against the running peak
+    equity, drawdown = build_curve(net, initial_balance)
+    max_drawdown = float(np.max(drawdown))
+
+    close_time = trades["close_time"]
+    equity_series = pd.Series(equity, index=close_time.to_numpy())
+
+    # Month-over-month return of end-of-month equity
+    month_key = (close_time.dt.year * 12 + close_time.dt.month).to_numpy()
+    month_end = equity_series.groupby(month_key).last().to_numpy()
+    month_start = np.concatenate(([initial_balance], month_end[:-1]))
+    monthly_return = float(np.mean(month_end / month_start - 1)) * 100
+
+    # Annualized Sharpe ratio of daily equity returns (risk-free rate of zero)
+    day_end = equity_series.groupby(close_time.dt.normalize().to_numpy()).last().to_numpy()
+    daily_returns = day_end / np.concatenate(([initial_balance], day_end[:-1])) - 1
+    std = float(np.std(daily_returns, ddof=1)) if len(daily_returns) > 1 else 0.0
+    sharpe_ratio = float(np.mean(daily_returns)) / std * np.sqrt(TRADING_DAYS_PER_YEAR) if std > 0 else 0.0
+
+    durations = (close_time - trades["open_time"]).dt.total_seconds().to_numpy()
+    durations = durations[~np.isnan(durations)]
+    avg_duration = format_duration(float(np.mean(durations))) if len(durations) else "n/a"
+
+    return {
+        "total_profit": round(float(net.sum()), 2),
+        "monthly_return": round(monthly_return, 2),
+        "win_rate": round(float(np.mean(net > 0)) * 100, 2),
+        "total_trades": int(len(net)),
+        "avg_trade_duration": avg_duration,
+        "max_drawdown": round(max_drawdown, 2),
+        "sharpe_ratio": round(float(sharpe_ratio), 2),
+    }
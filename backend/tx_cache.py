@@ -0,0 +1,90 @@
+"""
+Two-Tier Cache for Blockchain Transaction Lookups
+In-process LRU (with a TTL for results that can still change) in front of a
+MongoDB collection that keeps finalized transactions permanently
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]  # (chain, tx_hash)
+
+
+class TransactionCache:
+    """Cache of raw provider payloads keyed by (chain, tx_hash)
+
+    Finalized payloads never expire and are also written to MongoDB so other
+    processes and restarts reuse them. Unconfirmed or missing transactions are
+    kept in memory only, for ``pending_ttl`` seconds.
+    """
+
+    def __init__(self, max_entries: int = 10000, pending_ttl: float = 15.0):
+        self.max_entries = max_entries
+        self.pending_ttl = pending_ttl
+        self.collection = None
+        self._entries: "OrderedDict[CacheKey, Tuple[Optional[float], Optional[Dict[str, Any]]]]" = OrderedDict()
+        self.counters = {"memory_hits": 0, "store_hits": 0, "misses": 0}
+
+    def bind(self, collection):
+        """Attach the MongoDB collection used for finalized transactions"""
+        self.collection = collection
+
+    async def get(self, chain: str, tx_hash: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Return (hit, payload); a hit may carry ``None`` for a recently missing transaction"""
+        key = (chain, tx_hash)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return True, payload
+            del self._entries[key]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one(
+                    {"chain": chain, "tx_hash": tx_hash}, {"_id": 0, "payload": 1}
+                )
+            except Exception as e:
+                logger.warning(f"Transaction cache read failed: {str(e)}")
+                doc = None
+            if doc:
+                self._remember(key, None, doc["payload"])
+                self.counters["store_hits"] += 1
+                return True, doc["payload"]
+
+        self.counters["misses"] += 1
+        return False, None
+
+    async def put(self, chain: str, tx_hash: str, payload: Optional[Dict[str, Any]], finalized: bool):
+        """Cache a provider payload; only finalized payloads reach MongoDB"""
+        key = (chain, tx_hash)
+        if not finalized:
+            self._remember(key, time.monotonic() + self.pending_ttl, payload)
+            return
+
+        self._remember(key, None, payload)
+        if self.collection is not None:
+            try:
+                await self.collection.update_one(
+                    {"chain": chain, "tx_hash": tx_hash},
+                    {"$set": {"payload": payload, "cached_at": datetime.now(timezone.utc)}},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"Transaction cache write failed: {str(e)}")
+
+    def _remember(self, key: CacheKey, expires_at: Optional[float], payload: Optional[Dict[str, Any]]):
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "entries": len(self._entries)}
@@ -0,0 +1,301 @@
+"""
+Background Payment Verification Jobs
+Runs order verifications on a bounded pool of asyncio workers so the
+verify endpoint can answer immediately with a job resource
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from payment_verifier import provider_family
+from tracing import current_trace_id, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> running -> succeeded | failed
+ACTIVE_JOB_STATUSES = ["queued", "running"]
+
+# A process renews the lease on its active jobs every third of this; jobs
+# whose lease ran out belong to a stopped process and are claimed by another
+JOB_LEASE = timedelta(seconds=60)
+
+# Lease bookkeeping stays out of the job resource returned to clients
+PUBLIC_JOB_PROJECTION = {"_id": 0, "owner": 0, "lease_expires_at": 0}
+
+# Concurrent verifications allowed per provider family during batch runs,
+# sized to stay inside each free tier (BlockCypher allows ~3 req/s)
+FAMILY_CONCURRENCY = {
+    "tron": 4,
+    "blockcypher": 2,
+    "evm_rpc": 8,
+    "solana": 4
+}
+
+
+class VerificationQueueFull(Exception):
+    """Raised when the verification backlog is at capacity"""
+
+
+class VerificationJobQueue:
+    """Bounded in-process worker pool for order verification jobs
+
+    Job documents live in MongoDB so their progress can be read back by any
+    request; the in-memory queue only tracks jobs this process still has to run.
+    Each active job is leased to one process, so with several workers a job
+    interrupted by a restart is picked up exactly once.
+    """
+
+    def __init__(
+        self,
+        collection,
+        handler: Callable[[str], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        max_pending: int = 1000
+    ):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)  # job dicts
+        self._tasks: List[asyncio.Task] = []
+        self._active: Dict[str, Dict[str, Any]] = {}  # order_id -> job
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def start(self):
+        """Spawn the workers and claim jobs interrupted by a restart"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"verification-worker-{i}")
+            for i in range(self.workers)
+        ]
+        await self._claim_interrupted()
+        self._tasks.append(asyncio.create_task(self._lease_loop(), name="verification-leases"))
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs are released for another process to claim"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.collection.update_many(
+            {"owner": self.owner, "status": {"$in": ACTIVE_JOB_STATUSES}},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc)}}
+        )
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE.total_seconds() / 3)
+            try:
+                await self.collection.update_many(
+                    {"owner": self.owner, "status": {"$in": ACTIVE_JOB_STATUSES}},
+                    {"$set": {"lease_expires_at": datetime.now(timezone.utc) + JOB_LEASE}}
+                )
+                await self._claim_interrupted()
+            except Exception as e:
+                logger.error(f"Verification job lease renewal failed: {str(e)}")
+
+    async def _claim_interrupted(self):
+        """Take over active jobs whose owner stopped renewing their lease"""
+        claimed = 0
+        while not self._queue.full():
+            now = datetime.now(timezone.utc)
+            job = await self.collection.find_one_and_update(
+                {
+                    "status": {"$in": ACTIVE_JOB_STATUSES},
+                    "$or": [
+                        {"lease_expires_at": {"$lt": now}},
+                        # Jobs written before leases existed
+                        {"lease_expires_at": {"$exists": False}}
+                    ]
+                },
+                {"$set": {"status": "queued", "owner": self.owner, "lease_expires_at": now + JOB_LEASE}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if job is None:
+                break
+            if job["order_id"] in self._active:
+                await self._set(job, status="failed", error="Superseded by a newer job", finished_at=now)
+                continue
+            self._active[job["order_id"]] = job
+            self._queue.put_nowait(job)
+            claimed += 1
+        if claimed:
+            logger.info(f"Claimed {claimed} interrupted verification jobs")
+
+    def pending(self) -> int:
+        """Jobs queued in this process and not yet picked up by a worker"""
+        return self._queue.qsize()
+
+    async def submit(self, order_id: str) -> Dict[str, Any]:
+        """Queue a verification for an order, reusing any job already in flight"""
+        active = self._active.get(order_id)
+        if active:
+            return _public(active)
+
+        if self._queue.full():
+            raise VerificationQueueFull("Verification queue is full")
+
+        job = self._new_job(order_id)
+        # Registered before the insert so a concurrent submit reuses this job
+        self._active[order_id] = job
+        try:
+            await self.collection.insert_one(dict(job))
+            # Concurrent submits may have filled the queue during the insert
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._active.pop(order_id, None)
+            await self.collection.delete_one({"id": job["id"]})
+            raise VerificationQueueFull("Verification queue is full")
+        except BaseException:
+            self._active.pop(order_id, None)
+            raise
+        return _public(job)
+
+    async def run_inline(
+        self,
+        order_id: str,
+        handler: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Run a verification in the calling task as a job of this queue
+
+        Used by batch verification, so submit() hands back this job instead of
+        starting a second verification. Returns None if the order already has
+        a job in flight and raises RuntimeError if the verification failed.
+        The job is always released, and a cancelled one is recorded as failed.
+        """
+        if order_id in self._active:
+            return None
+        job = self._new_job(order_id)
+        self._active[order_id] = job
+        try:
+            await self.collection.insert_one(dict(job))
+            await self._run(job, handler)
+        except asyncio.CancelledError:
+            await self._set(job, status="failed", error="Cancelled", finished_at=datetime.now(timezone.utc))
+            raise
+        finally:
+            if self._active.get(order_id) is job:
+                del self._active[order_id]
+        if job["status"] != "succeeded":
+            raise RuntimeError(job["error"])
+        return job["result"]
+
+    def _new_job(self, order_id: str) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "order_id": order_id,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None,
+            "owner": self.owner,
+            "lease_expires_at": datetime.now(timezone.utc) + JOB_LEASE,
+            # Links the job's own trace back to the request that queued it
+            "request_trace_id": current_trace_id()
+        }
+
+    def is_active(self, order_id: str) -> bool:
+        """Whether a job for this order is queued or running in this process"""
+        return order_id in self._active
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the current state of a job"""
+        return await self.collection.find_one({"id": job_id}, PUBLIC_JOB_PROJECTION)
+
+    async def _set(self, job: Dict[str, Any], **fields):
+        job.update(fields)
+        await self.collection.update_one({"id": job["id"]}, {"$set": fields})
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                with start_trace(
+                    "verification_job", job_id=job["id"], order_id=job["order_id"],
+                    request_trace_id=job.get("request_trace_id")
+                ):
+                    await self._run(job)
+            except Exception as e:
+                logger.error(f"Verification worker error for job {job['id']}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any], handler: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None):
+        await self._set(job, status="running", started_at=datetime.now(timezone.utc))
+        try:
+            result = await (handler or self.handler)(job["order_id"])
+            await self._set(
+                job,
+                status="succeeded",
+                result=result,
+                finished_at=datetime.now(timezone.utc)
+            )
+        except Exception as e:
+            logger.error(f"Verification job {job['id']} failed: {str(e)}")
+            await self._set(
+                job,
+                status="failed",
+                error=str(e),
+                finished_at=datetime.now(timezone.utc)
+            )
+        finally:
+            self._active.pop(job["order_id"], None)
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key not in PUBLIC_JOB_PROJECTION}
+
+
+async def verify_orders_concurrently(
+    orders: List[Dict[str, Any]],
+    handler: Callable[[str], Awaitable[Dict[str, Any]]],
+    limits: Optional[Dict[str, int]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Verify many orders at once, yielding each result as soon as it completes
+
+    Each order needs ``id`` and ``payment_method``. Concurrency is capped per
+    provider family so one batch cannot exhaust a single explorer's quota.
+    """
+    limits = limits or FAMILY_CONCURRENCY
+    semaphores = {family: asyncio.Semaphore(limit) for family, limit in limits.items()}
+
+    async def run_one(order: Dict[str, Any]) -> Dict[str, Any]:
+        family = provider_family(order["payment_method"])
+        if family not in semaphores:
+            return {
+                "success": False,
+                "message": f"Unsupported payment method: {order['payment_method']}",
+                "details": None,
+                "order_id": order["id"]
+            }
+        async with semaphores[family]:
+            try:
+                with span("verify_order", order_id=order["id"], payment_method=order["payment_method"]):
+                    return await handler(order["id"])
+            except Exception as e:
+                logger.error(f"Batch verification error for order {order['id']}: {str(e)}")
+                return {
+                    "success": False,
+                    "message": f"Verification error: {str(e)}",
+                    "details": None,
+                    "order_id": order["id"]
+                }
+
+    tasks = [asyncio.create_task(run_one(order)) for order in orders]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: stop the remaining verifications
+        for task in tasks:
+            task.cancel()
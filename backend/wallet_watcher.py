@@ -0,0 +1,327 @@
+"""
+Wallet Watcher for Hash-Free Payment Matching
+Polls the incoming USDT transfers of each store wallet once per interval,
+keeps them until they are matched to a pending order by transaction hash or,
+when exactly one order fits, by (payment_method, amount)
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from payment_verifier import (
+    CRYPTO_WALLETS, TRONSCAN_API_URL, USDT_BSC_CONTRACT, USDT_ETH_CONTRACT, USDT_TRC20_CONTRACT
+)
+from provider_client import ProviderUnavailable
+from tracing import start_trace
+
+logger = logging.getLogger(__name__)
+
+# Only stablecoin payments can be matched by amount: orders are priced in USD,
+# so native-coin transfers (BTC, ETH, SOL...) still need a pasted hash
+WATCHED_METHODS = ["USDT_TRC20", "USDT_ETH", "USDT_BSC"]
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# Per-chain USDT contract, token decimals and blocks to wait before a log counts as final
+EVM_WATCHES = {
+    "USDT_ETH": {"chain": "eth", "contract": USDT_ETH_CONTRACT, "decimals": 6, "confirmations": 12},
+    "USDT_BSC": {"chain": "bsc", "contract": USDT_BSC_CONTRACT, "decimals": 18, "confirmations": 15},
+}
+
+# Public RPCs reject eth_getLogs over wide block ranges
+MAX_LOG_BLOCK_RANGE = 2000
+TRONSCAN_PAGE_SIZE = 50
+TRONSCAN_MAX_PAGES = 5
+# Pending orders and stored transfers older than this are no longer matched;
+# matches the TTL index on wallet_transfers.seen_at
+MATCH_WINDOW = timedelta(days=3)
+# A hash-less order is only paired with a transfer made this close to its
+# creation, so abandoned orders do not claim later customers' payments
+AMOUNT_MATCH_WINDOW = timedelta(hours=2)
+# Same tolerance as hash verification for orders that quoted the transfer's hash
+AMOUNT_TOLERANCE = 0.02
+
+# Applies a matched transfer to an order; False if the order was no longer pending
+MatchHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[bool]]
+
+
+def amount_key(amount: float) -> int:
+    """Amount in cents, so USD prices and token amounts compare exactly"""
+    return int(round(amount * 100))
+
+
+def match_transfers(
+    orders: List[Dict[str, Any]], transfers: List[Dict[str, Any]]
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Pair pending orders with the stored transfers that pay for them
+
+    An order that quoted a transfer's hash takes it when the amounts agree.
+    Otherwise a hash-less order and a transfer of the same method and amount
+    in cents, made within ``AMOUNT_MATCH_WINDOW`` of the order, are paired only
+    when each is the other's sole candidate; anything ambiguous is left for
+    hash verification.
+    """
+    by_hash = {order["transaction_hash"].lower(): order for order in orders if order.get("transaction_hash")}
+    matches = []
+    remaining = []
+    for transfer in transfers:
+        order = by_hash.pop(transfer["transaction_hash"].lower(), None)
+        if order is None:
+            remaining.append(transfer)
+        elif abs(transfer["amount"] - order["amount"]) <= order["amount"] * AMOUNT_TOLERANCE:
+            matches.append((order, transfer))
+        # A quoted hash with the wrong amount is left for hash verification to report
+
+    by_amount: Dict[Tuple[str, int], List[Dict[str, Any]]] = defaultdict(list)
+    for order in orders:
+        if not order.get("transaction_hash"):
+            by_amount[(order["payment_method"], amount_key(order["amount"]))].append(order)
+
+    candidates: Dict[str, List[Dict[str, Any]]] = defaultdict(list)  # order id -> transfers
+    pairs = []
+    for transfer in remaining:
+        fits = [
+            order for order in by_amount.get((transfer["payment_method"], amount_key(transfer["amount"])), [])
+            if abs(order["created_at"] - transfer["occurred_at"]) <= AMOUNT_MATCH_WINDOW
+        ]
+        for order in fits:
+            candidates[order["id"]].append(transfer)
+        if len(fits) == 1:
+            pairs.append((fits[0], transfer))
+    matches.extend((order, transfer) for order, transfer in pairs if len(candidates[order["id"]]) == 1)
+    return matches
+
+
+class WalletWatcher:
+    """Background poller of the store wallets' incoming transfers"""
+
+    def __init__(self, orders, state, transfers, verifier, on_match: MatchHandler, interval: float = 60.0):
+        self.orders = orders
+        self.state = state
+        self.transfers = transfers
+        self.verifier = verifier
+        self.on_match = on_match
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.counters = {"polls": 0, "transfers": 0, "matched": 0, "unmatched": 0, "errors": 0}
+
+    def start(self):
+        if not self._task and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+    async def _loop(self):
+        while True:
+            try:
+                with start_trace("wallet_watch.poll"):
+                    await self.poll()
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.error(f"Wallet watcher poll failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def poll(self):
+        """Store new transfers for every watched wallet and apply those that match an order
+
+        Cursors only move once the transfers they cover are stored and matched,
+        so a failed poll fetches the same range again.
+        """
+        self.counters["polls"] += 1
+        cursors = []
+        for payment_method in WATCHED_METHODS:
+            try:
+                if payment_method == "USDT_TRC20":
+                    transfers, cursor = await self._tron_transfers()
+                else:
+                    transfers, cursor = await self._evm_transfers(payment_method)
+            except ProviderUnavailable as e:
+                logger.warning(f"Wallet watcher skipped {payment_method}: {str(e)}")
+                continue
+            await self._store(payment_method, transfers)
+            if cursor is not None:
+                cursors.append((payment_method, cursor))
+
+        # Transfers that arrived before their order was submitted are matched on a later poll
+        cutoff = datetime.now(timezone.utc) - MATCH_WINDOW
+        pending = await self.orders.find(
+            {"status": "pending", "created_at": {"$gte": cutoff}, "payment_method": {"$in": WATCHED_METHODS}},
+            {"_id": 0, "id": 1, "payment_method": 1, "amount": 1, "transaction_hash": 1, "created_at": 1}
+        ).to_list(None)
+        stored = await self.transfers.find(
+            {"status": "unmatched", "occurred_at": {"$gte": cutoff}},
+            {"_id": 0, "status": 0, "order_id": 0}
+        ).to_list(None)
+        matched = await self._apply(match_transfers(pending, stored))
+        self.counters["unmatched"] = len(stored) - matched
+
+        for payment_method, cursor in cursors:
+            await self._save_cursor(payment_method, cursor)
+
+    async def _store(self, payment_method: str, transfers: List[Dict[str, Any]]):
+        now = datetime.now(timezone.utc)
+        for transfer in transfers:
+            self.counters["transfers"] += 1
+            # EVM logs carry no timestamp; when the watcher first saw them is close enough
+            occurred_at = (
+                datetime.fromtimestamp(transfer["timestamp"] / 1000, timezone.utc)
+                if "timestamp" in transfer else now
+            )
+            await self.transfers.update_one(
+                {"transaction_hash": transfer["transaction_hash"]},
+                {"$setOnInsert": {
+                    **transfer,
+                    "payment_method": payment_method,
+                    "occurred_at": occurred_at,
+                    "seen_at": now,
+                    "status": "unmatched"
+                }},
+                upsert=True
+            )
+
+    async def _apply(self, matches: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> int:
+        applied = 0
+        for order, transfer in matches:
+            try:
+                if not await self.on_match(order, transfer):
+                    continue
+            except Exception as e:
+                # The transfer stays unmatched and is offered again next poll
+                self.counters["errors"] += 1
+                logger.error(f"Applying transfer {transfer['transaction_hash']} to order {order['id']} failed: {str(e)}")
+                continue
+            await self.transfers.update_one(
+                {"transaction_hash": transfer["transaction_hash"]},
+                {"$set": {"status": "matched", "order_id": order["id"]}}
+            )
+            applied += 1
+            self.counters["matched"] += 1
+            logger.info(f"Wallet watcher matched {transfer['transaction_hash']} to order {order['id']}")
+        return applied
+
+    async def _cursor(self, name: str) -> Optional[int]:
+        doc = await self.state.find_one({"_id": name})
+        return doc["cursor"] if doc else None
+
+    async def _save_cursor(self, name: str, cursor: int):
+        await self.state.update_one(
+            {"_id": name},
+            {"$set": {"cursor": cursor, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def _tron_transfers(self) -> Tuple[List[Dict[str, Any]], int]:
+        """Confirmed TRC20 USDT transfers to the Tron wallet since the last poll, and the new cursor"""
+        wallet = CRYPTO_WALLETS["USDT_TRC20"]
+        since = await self._cursor("USDT_TRC20")
+        if since is None:
+            since = int((datetime.now(timezone.utc) - MATCH_WINDOW).timestamp() * 1000)
+
+        # Oldest first, so new transfers arriving mid-listing only append to it
+        # and a listing cut short by TRONSCAN_MAX_PAGES resumes where it stopped
+        rows = []
+        truncated = False
+        for page in range(TRONSCAN_MAX_PAGES):
+            response = await self.verifier.providers["tronscan"].get(
+                f"{TRONSCAN_API_URL}/api/token_trc20/transfers",
+                params={
+                    "toAddress": wallet,
+                    "contract_address": USDT_TRC20_CONTRACT,
+                    "start_timestamp": since + 1,
+                    "sort": "timestamp",
+                    "start": page * TRONSCAN_PAGE_SIZE,
+                    "limit": TRONSCAN_PAGE_SIZE
+                }
+            )
+            if response.status_code != 200:
+                raise ProviderUnavailable(f"TronScan transfer listing returned HTTP {response.status_code}")
+            batch = response.json().get("token_transfers", [])
+            rows.extend(batch)
+            if len(batch) < TRONSCAN_PAGE_SIZE:
+                break
+        else:
+            truncated = True
+
+        transfers = []
+        unconfirmed = []
+        for row in rows:
+            if row.get("to_address") != wallet or row.get("contractRet", "SUCCESS") != "SUCCESS":
+                continue
+            if not row.get("confirmed"):
+                unconfirmed.append(row["block_ts"])
+                continue
+            decimals = int(row.get("tokenInfo", {}).get("tokenDecimal", 6))
+            transfers.append({
+                "transaction_hash": row["transaction_id"],
+                "from_address": row.get("from_address"),
+                "to_address": wallet,
+                "amount": int(row.get("quant", "0")) / 10 ** decimals,
+                "timestamp": row["block_ts"],
+                "confirmed": True
+            })
+
+        # Stop short of the oldest unconfirmed transfer so it is seen again once
+        # confirmed, and of the last timestamp of a truncated listing, whose
+        # other transfers may be on the next page
+        cursor = max((row["block_ts"] for row in rows), default=since)
+        if truncated:
+            cursor -= 1
+        if unconfirmed:
+            cursor = min(cursor, min(unconfirmed) - 1)
+        transfers = sorted((t for t in transfers if t["timestamp"] <= cursor), key=lambda t: t["timestamp"])
+        return transfers, max(cursor, since)
+
+    async def _evm_transfers(self, payment_method: str) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Final USDT Transfer logs to the EVM wallet since the last scanned block, and the new cursor"""
+        watch = EVM_WATCHES[payment_method]
+        pool = self.verifier.rpc_pools[watch["chain"]]
+        wallet = CRYPTO_WALLETS[payment_method].lower()
+
+        head = int(await _rpc_call(pool, "eth_blockNumber", []), 16)
+        to_block = head - watch["confirmations"]
+        last = await self._cursor(payment_method)
+        from_block = last + 1 if last is not None else to_block - MAX_LOG_BLOCK_RANGE + 1
+        to_block = min(to_block, from_block + MAX_LOG_BLOCK_RANGE - 1)
+        if to_block < from_block:
+            return [], None
+
+        logs = await _rpc_call(pool, "eth_getLogs", [{
+            "address": watch["contract"],
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+            # Transfer(from, to=wallet, value)
+            "topics": [TRANSFER_TOPIC, None, "0x" + wallet[2:].rjust(64, "0")]
+        }])
+
+        transfers = [
+            {
+                "transaction_hash": log["transactionHash"],
+                "from_address": "0x" + log["topics"][1][-40:],
+                "to_address": wallet,
+                "amount": int(log["data"], 16) / 10 ** watch["decimals"],
+                "block": int(log["blockNumber"], 16),
+                "confirmed": True
+            }
+            for log in logs
+            if not log.get("removed")
+        ]
+        return transfers, to_block
+
+
+async def _rpc_call(pool, method: str, params: List[Any]) -> Any:
+    response = await pool.post({"jsonrpc": "2.0", "method": method, "params": params, "id": 1})
+    reply = response.json()
+    if "result" not in reply:
+        raise ProviderUnavailable(f"{pool.name} {method} failed: {reply.get('error')}")
+    return reply["result"]
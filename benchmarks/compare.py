@@ -0,0 +1,52 @@
+"""
+Compare Two Load-Generator Reports
+Prints per-endpoint latency percentiles and throughput side by side with the
+relative change, e.g. between the reports of two commits
+
+    python benchmarks/compare.py bench-abc1234.json bench-def5678.json
+"""
+
+import argparse
+import json
+from typing import Dict, Optional
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return "n/a"
+    if before == 0:
+        return "+inf" if after else "0%"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(baseline: Dict, candidate: Dict):
+    print(f"baseline {baseline['label']} vs candidate {candidate['label']}")
+    labels = sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))
+    for label in labels:
+        before = baseline["endpoints"].get(label, {})
+        after = candidate["endpoints"].get(label, {})
+        print(f"\n{label}")
+        for metric in METRICS:
+            print(f"  {metric:15} {str(before.get(metric, '-')):>10} -> {str(after.get(metric, '-')):>10}  "
+                  f"{change(before.get(metric), after.get(metric)):>8}")
+        errors = (before.get("errors", 0), after.get("errors", 0))
+        if any(errors):
+            print(f"  {'errors':15} {errors[0]:>10} -> {errors[1]:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
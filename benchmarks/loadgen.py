@@ -0,0 +1,248 @@
+"""
+Async Load Generator for the EA Store API
+Drives product browsing, order creation and payment verification at a target
+request rate and writes p50/p95/p99 latency and throughput per endpoint
+
+    python benchmarks/loadgen.py --base-url http://127.0.0.1:8001/api --rps 50 \\
+        --duration 60 --mix browse=70,order=20,verify=10 --output bench-$(git rev-parse --short HEAD).json
+
+Point the backend at benchmarks/mock_explorer.py so verification does not hit
+real explorers. Arrivals are open-loop: scenarios start on schedule whether or
+not earlier ones have finished, so a slow server shows up as latency rather
+than as a lower request rate. Compare two reports with benchmarks/compare.py.
+
+Our own client-side provider quotas still apply (BlockCypher allows 100
+lookups per hour), so the default payment methods avoid BTC and LTC.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_METHODS = ["USDT_TRC20", "USDT_ETH", "USDT_BSC", "TRX", "ETH", "BNB", "SOL"]
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return 0.0
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def synthetic_hash(payment_method: str, amount: float) -> str:
+    """Unique hash the mock explorer answers as a confirmed payment of ``amount``"""
+    digits = uuid.uuid4().hex + uuid.uuid4().hex[:24]
+    cents = f"{int(round(amount * 100)):08d}"
+    if payment_method in ("ETH", "USDT_ETH", "USDT_BSC", "BNB"):
+        return "0x" + digits + cents
+    return digits + cents
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint label"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, started: float, ok: bool):
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[label] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        endpoints = {}
+        for label in sorted(self.samples):
+            ordered = sorted(self.samples[label])
+            endpoints[label] = {
+                "count": len(ordered),
+                "errors": self.errors[label],
+                "throughput_rps": round(len(ordered) / elapsed, 2),
+                "p50_ms": round(percentile(ordered, 50), 2),
+                "p95_ms": round(percentile(ordered, 95), 2),
+                "p99_ms": round(percentile(ordered, 99), 2),
+                "max_ms": round(ordered[-1], 2)
+            }
+        return endpoints
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, methods: List[str], poll_interval: float, verify_timeout: float):
+        self.client = client
+        self.methods = methods
+        self.poll_interval = poll_interval
+        self.verify_timeout = verify_timeout
+        self.recorder = Recorder()
+        self.products: List[Dict] = []
+        self.etag: Optional[str] = None
+        self.orders: List[str] = []
+
+    async def call(self, label: str, method: str, url: str, expect=(200,), **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(label, started, ok=False)
+            return None
+        self.recorder.record(label, started, ok=response.status_code in expect)
+        return response
+
+    async def setup(self):
+        response = await self.client.get("/products")
+        response.raise_for_status()
+        self.products = response.json()
+        if not self.products:
+            raise SystemExit("The store has no products to order")
+
+    async def browse(self):
+        # Returning visitors revalidate the catalog with their ETag
+        headers = {"If-None-Match": self.etag} if self.etag and random.random() < 0.5 else {}
+        response = await self.call("GET /products", "GET", "/products", expect=(200, 304), headers=headers)
+        if response is not None and response.headers.get("etag"):
+            self.etag = response.headers["etag"]
+        product = random.choice(self.products)
+        await self.call("GET /products/{id}", "GET", f"/products/{product['id']}")
+        await self.call("GET /performance", "GET", "/performance")
+
+    async def order(self) -> Optional[str]:
+        product = random.choice(self.products)
+        payment_method = random.choice(self.methods)
+        response = await self.call("POST /orders", "POST", "/orders", json={
+            "product_id": product["id"],
+            "customer_name": "Load Test",
+            "customer_email": "loadtest@example.com",
+            "amount": product["price"],
+            "payment_method": payment_method,
+            "transaction_hash": synthetic_hash(payment_method, product["price"])
+        })
+        if response is None or response.status_code != 200:
+            return None
+        order_id = response.json()["id"]
+        self.orders.append(order_id)
+        return order_id
+
+    async def verify(self):
+        order_id = self.orders.pop() if self.orders else await self.order()
+        if not order_id:
+            return
+        started = time.perf_counter()
+        response = await self.call(
+            "POST /orders/{id}/verify", "POST", f"/orders/{order_id}/verify", expect=(202,)
+        )
+        if response is None or response.status_code != 202:
+            self.recorder.record("verify (end to end)", started, ok=False)
+            return
+        job = response.json()
+        deadline = time.monotonic() + self.verify_timeout
+        while job.get("status") in ("queued", "running") and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            response = await self.call("GET /verification-jobs/{id}", "GET", f"/verification-jobs/{job['id']}")
+            if response is None or response.status_code != 200:
+                break
+            job = response.json()
+        succeeded = job.get("status") == "succeeded" and bool((job.get("result") or {}).get("success"))
+        self.recorder.record("verify (end to end)", started, ok=succeeded)
+
+
+async def run(args) -> Dict:
+    mix = {}
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"browse", "order", "verify"}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios in --mix: {sorted(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(client, args.methods.split(","), args.poll_interval, args.verify_timeout)
+        await generator.setup()
+        scenarios = {"browse": generator.browse, "order": generator.order, "verify": generator.verify}
+        names, weights = list(mix), list(mix.values())
+
+        in_flight = set()
+        dropped = 0
+        interval = 1 / args.rps
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        next_start = started
+        while next_start - started < args.duration:
+            await asyncio.sleep(max(0.0, next_start - time.perf_counter()))
+            next_start += interval
+            if len(in_flight) >= args.max_in_flight:
+                # The server has fallen too far behind; count rather than queue without bound
+                dropped += 1
+                continue
+            task = asyncio.create_task(scenarios[random.choices(names, weights)[0]]())
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=args.verify_timeout)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "label": args.label,
+        "started_at": started_at.isoformat(),
+        "base_url": args.base_url,
+        "target_rps": args.rps,
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "dropped_scenarios": dropped,
+        "endpoints": generator.recorder.report(elapsed)
+    }
+
+
+def git_label() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: Dict):
+    print(f"{report['label']}: {report['duration_s']}s at {report['target_rps']} scenarios/s, "
+          f"{report['dropped_scenarios']} dropped")
+    print(f"{'endpoint':34} {'count':>7} {'errors':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for label, row in report["endpoints"].items():
+        print(f"{label:34} {row['count']:>7} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001/api")
+    parser.add_argument("--rps", type=float, default=20.0, help="scenarios started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to generate load")
+    parser.add_argument("--mix", default="browse=70,order=20,verify=10", help="scenario weights")
+    parser.add_argument("--methods", default=",".join(DEFAULT_METHODS), help="payment methods to order with")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="seconds between job polls")
+    parser.add_argument("--verify-timeout", type=float, default=60.0)
+    parser.add_argument("--label", default=None, help="report label, defaults to the current git commit")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+    args.label = args.label or git_label()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Mock Blockchain Explorer for Benchmarks
+Imitates the TronScan, BlockCypher, ETH/BSC JSON-RPC and Solana RPC responses
+PaymentVerifier parses, with configurable latency and error rates
+
+Run it, then start the backend with the environment it prints:
+
+    python benchmarks/mock_explorer.py --port 9100 --latency-ms 80 --jitter-ms 40 \\
+        --error-rate 0.01 --profile tron=250 --profile sol=120:0.05
+
+Transaction hashes steer the responses:
+- hashes starting with "missing" are unknown to the explorer
+- hashes starting with "pending" are unconfirmed
+- a hash ending in 8 digits pays that many cents of USDT (e.g. ...00009000 is $90)
+Any other hash is a confirmed payment to the store wallet.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from payment_verifier import CRYPTO_WALLETS, USDT_TRC20_CONTRACT  # noqa: E402
+
+PROVIDERS = ["tron", "blockcypher", "eth", "bsc", "sol"]
+
+
+class Profile:
+    """Latency and failure behaviour of one mocked provider"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, slow_rate: float, slow_ms: float):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+
+    async def delay(self):
+        latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if random.random() < self.slow_rate:
+            # Occasional stragglers give the tail something to hedge against
+            latency += self.slow_ms
+        await asyncio.sleep(latency / 1000)
+
+    def failed(self) -> bool:
+        return random.random() < self.error_rate
+
+
+def usdt_cents(tx_hash: str) -> int:
+    tail = tx_hash[-8:]
+    return int(tail) if tail.isdigit() else 10000
+
+
+def tron_transaction(tx_hash: str) -> Dict[str, Any]:
+    if tx_hash.startswith("missing"):
+        return {}
+    return {
+        "hash": tx_hash,
+        "confirmed": not tx_hash.startswith("pending"),
+        "ownerAddress": "TMockSender1111111111111111111111",
+        "toAddress": CRYPTO_WALLETS["TRX"],
+        "amount": 25_000_000,
+        "timestamp": int(time.time() * 1000),
+        "trc20TransferInfo": [{
+            "from_address": "TMockSender1111111111111111111111",
+            "to_address": CRYPTO_WALLETS["USDT_TRC20"],
+            "contract_address": USDT_TRC20_CONTRACT,
+            "amount_str": str(usdt_cents(tx_hash) * 10_000)
+        }]
+    }
+
+
+def blockcypher_transaction(coin: str, tx_hash: str) -> Dict[str, Any]:
+    if tx_hash.startswith("missing"):
+        return {"error": f"Transaction {tx_hash} not found."}
+    return {
+        "hash": tx_hash,
+        "confirmations": 0 if tx_hash.startswith("pending") else 12,
+        "confirmed": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "inputs": [{"addresses": ["mock-sender"]}],
+        "outputs": [{"addresses": [CRYPTO_WALLETS[coin.upper()]], "value": 5_000_000}]
+    }
+
+
+def rpc_result(chain: str, method: str, params: list) -> Optional[Any]:
+    tx_hash = params[0] if params and isinstance(params[0], str) else ""
+    if method == "eth_blockNumber":
+        return hex(int(time.time()) // 3)
+    if method == "eth_getLogs":
+        return []
+    if tx_hash.startswith("missing"):
+        return None
+    if method == "eth_getTransactionByHash":
+        return {
+            "hash": tx_hash,
+            "from": "0x" + "11" * 20,
+            "to": CRYPTO_WALLETS["ETH"].lower(),
+            "value": hex(5 * 10 ** 16),
+            "blockNumber": hex(19_000_000)
+        }
+    if method == "eth_getTransactionReceipt":
+        return None if tx_hash.startswith("pending") else {"status": "0x1", "transactionHash": tx_hash}
+    if method == "getTransaction":
+        return None if tx_hash.startswith("pending") else {"blockTime": int(time.time()), "meta": {"err": None}}
+    raise KeyError(method)
+
+
+def create_app(profiles: Dict[str, Profile]) -> FastAPI:
+    app = FastAPI(title="Mock blockchain explorer")
+    unavailable = JSONResponse({"error": "mock upstream failure"}, status_code=503)
+
+    @app.get("/tronscan/api/transaction-info")
+    async def tron_transaction_info(hash: str):
+        await profiles["tron"].delay()
+        if profiles["tron"].failed():
+            return unavailable
+        return tron_transaction(hash)
+
+    @app.get("/tronscan/api/token_trc20/transfers")
+    async def tron_transfers():
+        await profiles["tron"].delay()
+        return {"total": 0, "token_transfers": []}
+
+    @app.get("/blockcypher/v1/{coin}/main/txs/{hashes}")
+    async def blockcypher_txs(coin: str, hashes: str):
+        await profiles["blockcypher"].delay()
+        if profiles["blockcypher"].failed():
+            return unavailable
+        txs = [blockcypher_transaction(coin, tx_hash) for tx_hash in hashes.split(";")]
+        if len(txs) == 1:
+            return JSONResponse(txs[0], status_code=404 if "error" in txs[0] else 200)
+        return txs
+
+    @app.post("/rpc/{chain}")
+    async def json_rpc(chain: str, request: Request):
+        profile = profiles[chain]
+        await profile.delay()
+        if profile.failed():
+            return unavailable
+        payload = await request.json()
+        calls = payload if isinstance(payload, list) else [payload]
+        replies = []
+        for call in calls:
+            try:
+                result = rpc_result(chain, call.get("method"), call.get("params") or [])
+                replies.append({"jsonrpc": "2.0", "id": call.get("id"), "result": result})
+            except KeyError:
+                replies.append({
+                    "jsonrpc": "2.0", "id": call.get("id"),
+                    "error": {"code": -32601, "message": "Method not found"}
+                })
+        return replies if isinstance(payload, list) else replies[0]
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="base response latency")
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="uniform jitter added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument(
+        "--profile", action="append", default=[], metavar="PROVIDER=LATENCY_MS[:ERROR_RATE]",
+        help=f"per-provider override, provider one of {', '.join(PROVIDERS)}"
+    )
+    args = parser.parse_args()
+
+    profiles = {
+        name: Profile(args.latency_ms, args.jitter_ms, args.error_rate, args.slow_rate, args.slow_ms)
+        for name in PROVIDERS
+    }
+    for override in args.profile:
+        name, _, values = override.partition("=")
+        if name not in profiles:
+            parser.error(f"Unknown provider in --profile: {name}")
+        latency, _, error_rate = values.partition(":")
+        profiles[name].latency_ms = float(latency)
+        if error_rate:
+            profiles[name].error_rate = float(error_rate)
+
+    base = f"http://{args.host}:{args.port}"
+    print("Start the backend with:")
+    print(f"  TRONSCAN_API_URL={base}/tronscan")
+    print(f"  BLOCKCYPHER_API_URL={base}/blockcypher")
+    print(f"  ETH_RPC_URLS={base}/rpc/eth")
+    print(f"  BSC_RPC_URLS={base}/rpc/bsc")
+    print(f"  SOLANA_RPC_URLS={base}/rpc/sol")
+    uvicorn.run(create_app(profiles), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
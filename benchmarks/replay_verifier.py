@@ -0,0 +1,88 @@
+"""
+Replay Recorded Payment Verifications
+Re-runs every verification saved in a cassette against the recorded provider
+responses, with no network access or provider quotas, and reports per-method
+latency plus any verdict that no longer matches the recording
+
+Record a cassette by running the backend (or anything using PaymentVerifier) with
+
+    PAYMENT_VERIFIER_MODE=record PAYMENT_VERIFIER_CASSETTE=verifier.jsonl.gz
+
+then replay it, optionally under cProfile to see where parsing time goes:
+
+    python benchmarks/replay_verifier.py verifier.jsonl.gz --repeat 20 --profile
+"""
+
+import argparse
+import asyncio
+import cProfile
+import pstats
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from cassette import CassetteMiss  # noqa: E402
+from loadgen import percentile  # noqa: E402
+from payment_verifier import PaymentVerifier  # noqa: E402
+from tx_cache import TransactionCache  # noqa: E402
+
+
+async def replay(path: str, repeat: int) -> int:
+    verifier = PaymentVerifier(mode="replay", cassette_path=path)
+    verifications = verifier.cassette.verifications
+    if not verifications:
+        raise SystemExit(f"{path} has no recorded verifications")
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    mismatches = 0
+    try:
+        for round_number in range(repeat):
+            # Each round must go back to the cassette rather than the transaction cache
+            verifier.cache = TransactionCache()
+            for entry in verifications:
+                args = entry["args"]
+                started = time.perf_counter()
+                try:
+                    result = list(await verifier.verify_payment(**args))
+                except CassetteMiss as e:
+                    result = [False, f"cassette miss: {str(e)}", {}]
+                samples[args["payment_method"]].append((time.perf_counter() - started) * 1000)
+                if round_number == 0 and result[:2] != entry["result"][:2]:
+                    mismatches += 1
+                    print(f"MISMATCH {args['payment_method']} {args['transaction_hash']}: "
+                          f"recorded {entry['result'][:2]}, replayed {result[:2]}")
+    finally:
+        await verifier.close()
+
+    print(f"{len(verifications)} verifications x {repeat} rounds, {mismatches} mismatches")
+    print(f"{'method':12} {'count':>7} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9}")
+    for method in sorted(samples):
+        ordered = sorted(samples[method])
+        print(f"{method:12} {len(ordered):>7} {percentile(ordered, 50):>9.3f} "
+              f"{percentile(ordered, 95):>9.3f} {ordered[-1]:>9.3f}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the whole cassette this many times")
+    parser.add_argument("--profile", action="store_true", help="print the top cProfile entries")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    mismatches = asyncio.run(replay(args.cassette, args.repeat))
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
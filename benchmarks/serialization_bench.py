@@ -0,0 +1,112 @@
+"""
+Response Serialization Benchmark
+Measures the CPU time per request FastAPI spends turning order documents into
+a response: through ``response_model=List[Order]`` as the API does by default,
+versus the fast path of fast_json.py (with and without debug validation)
+
+    python benchmarks/serialization_bench.py --sizes 100,1000,10000
+
+Requests run in-process over ASGI, so no database or network time is included.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+# server.py builds its Motor client at import; it only connects on first use
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "serialization_bench")
+
+import fast_json  # noqa: E402
+from server import ORDER_DOCS, Order  # noqa: E402
+
+# server.py logs every httpx request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def order_documents(count: int) -> List[dict]:
+    """Order documents shaped as the tz-aware Motor client returns them"""
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(count):
+        docs.append({
+            "id": str(uuid.uuid4()),
+            "product_id": str(uuid.uuid4()),
+            "customer_name": f"Customer {i}",
+            "customer_email": f"customer{i}@example.com",
+            "amount": 90.0,
+            "payment_method": "USDT_TRC20",
+            "transaction_hash": uuid.uuid4().hex + uuid.uuid4().hex,
+            "license_key": f"EA-{uuid.uuid4().hex.upper()[:22]}",
+            "status": "verified",
+            "verification_status": "verified",
+            "verification_message": "Payment verified successfully",
+            "verification_details": {"from": "TMockSender", "amount": 90.0, "confirmed": True},
+            "verified_at": created + timedelta(minutes=i, seconds=30),
+            "created_at": created + timedelta(minutes=i)
+        })
+    return docs
+
+
+def build_app(docs: List[dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/model", response_model=List[Order])
+    async def via_response_model():
+        return docs
+
+    @app.get("/fast")
+    async def via_fast_path():
+        return ORDER_DOCS.response(docs)
+
+    return app
+
+
+async def cpu_per_request(client: httpx.AsyncClient, path: str, repeat: int) -> float:
+    await client.get(path)  # warm up
+    started = time.process_time()
+    for _ in range(repeat):
+        response = await client.get(path)
+        response.raise_for_status()
+    return (time.process_time() - started) / repeat * 1000
+
+
+async def run(sizes: List[int], budget: float):
+    print(f"encoder: {'orjson' if fast_json.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'docs':>7} {'response_model':>15} {'fast':>9} {'fast+debug':>11} {'saved':>9} {'speedup':>8}   (CPU ms/request)")
+    for size in sizes:
+        app = build_app(order_documents(size))
+        # Keep the slowest variant under roughly ``budget`` seconds per size
+        repeat = max(3, int(budget / max(size * 1.5e-4, 1e-4)))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            model_ms = await cpu_per_request(client, "/model", repeat)
+            fast_json.VALIDATE_RESPONSES = False
+            fast_ms = await cpu_per_request(client, "/fast", repeat)
+            fast_json.VALIDATE_RESPONSES = True
+            debug_ms = await cpu_per_request(client, "/fast", repeat)
+            fast_json.VALIDATE_RESPONSES = False
+        print(f"{size:>7} {model_ms:>15.2f} {fast_ms:>9.2f} {debug_ms:>11.2f} {model_ms - fast_ms:>9.2f} "
+              f"{model_ms / fast_ms:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="documents per response")
+    parser.add_argument("--budget", type=float, default=2.0, help="approximate seconds per size")
+    args = parser.parse_args()
+    asyncio.run(run([int(size) for size in args.sizes.split(",")], args.budget))
+
+
+if __name__ == "__main__":
+    main()
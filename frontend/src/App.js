@@ -32,9 +32,9 @@ const CRYPTO_WALLETS = {
 };
 
 const PAYMENT_METHODS = [
-  { value: "USDT_TRC20", label: "USDT (TRC20)", network: "Tron Network" },
-  { value: "USDT_ETH", label: "USDT (ERC20)", network: "Ethereum Network" },
-  { value: "USDT_BSC", label: "USDT (BEP20)", network: "BSC Network" },
+  { value: "USDT_TRC20", label: "USDT (TRC20)", network: "Tron Network", autoDetect: true },
+  { value: "USDT_ETH", label: "USDT (ERC20)", network: "Ethereum Network", autoDetect: true },
+  { value: "USDT_BSC", label: "USDT (BEP20)", network: "BSC Network", autoDetect: true },
   { value: "SOL", label: "Solana (SOL)", network: "Solana Network" },
   { value: "BNB", label: "BNB", network: "BSC Network" },
   { value: "ETH", label: "Ethereum (ETH)", network: "Ethereum Network" },
@@ -43,6 +43,17 @@ const PAYMENT_METHODS = [
   { value: "LTC", label: "Litecoin (LTC)", network: "Litecoin Network" }
 ];
 
+// crypto.randomUUID only exists in secure contexts (HTTPS or localhost);
+// getRandomValues works everywhere, e.g. on a plain-HTTP staging host
+const newIdempotencyKey = () => {
+  if (window.crypto?.randomUUID) return window.crypto.randomUUID();
+  const bytes = window.crypto.getRandomValues(new Uint8Array(16));
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+};
+
 function App() {
   const [products, setProducts] = useState([]);
   const [performance, setPerformance] = useState(null);
@@ -59,6 +70,8 @@ function App() {
   const [licenseKey, setLicenseKey] = useState("");
   const [showPaymentDetails, setShowPaymentDetails] = useState(false);
   const [currentOrderId, setCurrentOrderId] = useState(null);
+  // Sent with the order so a retried submit returns the same order
+  const [checkoutKey, setCheckoutKey] = useState(null);
   const [verifying, setVerifying] = useState(false);
   const [verificationResult, setVerificationResult] = useState(null);
   
@@ -130,7 +143,9 @@ function App() {
       return;
     }
 
-    if (!orderForm.transaction_hash) {
+    // USDT payments of the exact amount are detected on the wallet, so the hash is optional for them
+    const autoDetect = PAYMENT_METHODS.find(m => m.value === orderForm.payment_method)?.autoDetect;
+    if (!orderForm.transaction_hash && !autoDetect) {
       toast.error("Please enter your transaction hash");
       return;
     }
@@ -142,16 +157,20 @@ function App() {
         customer_email: orderForm.customer_email,
         amount: selectedProduct.price,
         payment_method: orderForm.payment_method,
-        transaction_hash: orderForm.transaction_hash
+        transaction_hash: orderForm.transaction_hash || null
       };
 
-      const response = await axios.post(`${API}/orders`, orderData);
+      const response = await axios.post(`${API}/orders`, orderData, {
+        headers: { "Idempotency-Key": checkoutKey }
+      });
       setLicenseKey(response.data.license_key);
       setCurrentOrderId(response.data.id);
       setPurchaseComplete(true);
       toast.success("Order created! You can now verify your payment.");
     } catch (error) {
       console.error("Error creating order:", error);
+      // The server answered, so a corrected form is a new request; keep the key after network errors
+      if (error.response) setCheckoutKey(newIdempotencyKey());
       toast.error("Order failed. Please try again.");
     }
   };
@@ -164,9 +183,45 @@ function App() {
   const openPurchaseDialog = (product) => {
     setSelectedProduct(product);
     setPurchaseComplete(false);
+    setCheckoutKey(newIdempotencyKey());
     setOrderDialogOpen(true);
   };
 
+  // Resolves with the verification outcome pushed over the order's event stream
+  const waitForVerification = (orderId, { awaitDetection = false, timeoutMs = 120000 } = {}) =>
+    new Promise((resolve) => {
+      const source = new EventSource(`${API}/orders/${orderId}/events`);
+      const finish = (result) => {
+        clearTimeout(timer);
+        source.close();
+        resolve(result);
+      };
+      const timer = setTimeout(() => finish({
+        success: false,
+        message: awaitDetection
+          ? "Payment not detected yet. Transfers are checked every minute."
+          : "Verification is taking longer than expected. Please try again shortly."
+      }), timeoutMs);
+      const handleOrder = (order) => {
+        if (order.status === "verified" || order.status === "completed") {
+          finish({ success: true, message: order.verification_message || "Payment verified successfully" });
+        } else if (!awaitDetection && order.verification_status === "failed") {
+          finish({ success: false, message: order.verification_message || "Verification failed" });
+        }
+      };
+      source.addEventListener("order", (event) => handleOrder(JSON.parse(event.data)));
+      source.addEventListener("error", async () => {
+        // The server closes the stream for good (204) once the order is final
+        if (source.readyState !== EventSource.CLOSED) return;
+        try {
+          const response = await axios.get(`${API}/orders/${orderId}`);
+          handleOrder(response.data);
+        } catch (error) {
+          console.error("Error fetching order:", error);
+        }
+      });
+    });
+
   const verifyPayment = async () => {
     if (!currentOrderId) return;
     
@@ -174,13 +229,22 @@ function App() {
     setVerificationResult(null);
     
     try {
-      const response = await axios.post(`${API}/orders/${currentOrderId}/verify`);
-      setVerificationResult(response.data);
+      let result;
+      if (!orderForm.transaction_hash) {
+        // No hash to look up: wait for the wallet watcher to mark the order once the transfer arrives
+        result = await waitForVerification(currentOrderId, { awaitDetection: true });
+      } else {
+        // Verification runs in the background; its outcome is pushed over the event stream
+        await axios.post(`${API}/orders/${currentOrderId}/verify`);
+        result = await waitForVerification(currentOrderId);
+      }
       
-      if (response.data.success) {
+      setVerificationResult(result);
+      
+      if (result.success) {
         toast.success("Payment verified successfully! ✅");
-      } else {
-        toast.error(`Verification failed: ${response.data.message}`);
+      } else if (orderForm.transaction_hash) {
+        toast.error(`Verification failed: ${result.message}`);
       }
     } catch (error) {
       console.error("Verification error:", error);
@@ -1172,11 +1236,15 @@ function App() {
                       placeholder="0x... or txid..."
                       value={orderForm.transaction_hash}
                       onChange={(e) => setOrderForm({...orderForm, transaction_hash: e.target.value})}
-                      required
+                      required={!PAYMENT_METHODS.find(m => m.value === orderForm.payment_method)?.autoDetect}
                       className="bg-slate-800 border-slate-700 text-white font-mono text-sm"
                       data-testid="input-transaction-hash"
                     />
-                    <p className="text-xs text-slate-500">After sending payment, paste your transaction hash here</p>
+                    <p className="text-xs text-slate-500">
+                      {PAYMENT_METHODS.find(m => m.value === orderForm.payment_method)?.autoDetect
+                        ? "Optional: send the exact amount and your payment is detected automatically"
+                        : "After sending payment, paste your transaction hash here"}
+                    </p>
                   </div>
                 )}
 
@@ -0,0 +1,32 @@
+"""
+In-Memory Collection
+Just enough of the Motor collection API for unit tests that only read and
+write documents by equality on top-level fields
+"""
+
+import copy
+from typing import Any, Dict, List, Optional
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    return all(doc.get(key) == value for key, value in query.items())
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs: List[Dict[str, Any]] = []
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        for doc in self.docs:
+            if _matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        for doc in self.docs:
+            if _matches(doc, query):
+                doc.update(copy.deepcopy(update.get("$set", {})))
+                return
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from provider_client import ProviderClient, ProviderUnavailable
+
+
+def _client(handler, **kwargs) -> ProviderClient:
+    client = ProviderClient(
+        "test", httpx.AsyncClient(transport=httpx.MockTransport(handler)), [(1000, 1000)],
+        failure_threshold=1, reset_timeout=0.01, max_retries=0, **kwargs
+    )
+    client.breaker.record_failure()
+    time.sleep(0.02)
+    return client
+
+
+def test_cancelled_trial_does_not_leave_circuit_half_open():
+    slow = True
+
+    async def handler(request):
+        if slow:
+            await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    async def run():
+        nonlocal slow
+        client = _client(handler)
+        trial = asyncio.ensure_future(client.get("https://provider.test/"))
+        await asyncio.sleep(0.01)
+        assert client.breaker.state == "half_open"
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        assert client.breaker.state == "open"
+        slow = False
+        response = await client.get("https://provider.test/")
+        return client, response
+
+    client, response = asyncio.run(run())
+    assert response.status_code == 200
+    assert client.breaker.state == "closed"
+
+
+def test_throttled_call_does_not_take_the_trial():
+    client = _client(lambda request: httpx.Response(200), max_queue_wait=0)
+    client.buckets[0].tokens = 0
+    client.buckets[0].rate = 0.001
+
+    with pytest.raises(ProviderUnavailable, match="rate limit"):
+        asyncio.run(client.get("https://provider.test/"))
+    assert client.breaker.state == "open"
+    assert client.breaker.allow()
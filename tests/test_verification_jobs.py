@@ -0,0 +1,50 @@
+import asyncio
+
+from tests.fake_collection import FakeCollection
+from verification_jobs import VerificationJobQueue, verify_orders_concurrently
+
+
+async def _cancelled_batch(queue: VerificationJobQueue, started: list):
+    async def slow_verification(order_id: str):
+        started.append(order_id)
+        await asyncio.sleep(10)
+        return {"success": True, "order_id": order_id}
+
+    async def handler(order_id: str):
+        return await queue.run_inline(order_id, slow_verification)
+
+    orders = [{"id": f"o{i}", "payment_method": "BTC"} for i in range(6)]
+    results = verify_orders_concurrently(orders, handler, limits={"blockcypher": 2})
+    pending = asyncio.ensure_future(results.__anext__())
+    await asyncio.sleep(0.05)
+    # Client disconnects: the response stream is closed mid-batch
+    pending.cancel()
+    await asyncio.gather(pending, return_exceptions=True)
+    await results.aclose()
+    await asyncio.sleep(0.05)
+
+
+def test_cancelled_batch_releases_every_job():
+    jobs = FakeCollection()
+    queue = VerificationJobQueue(jobs, handler=None)
+    started = []
+    asyncio.run(_cancelled_batch(queue, started))
+
+    assert started == ["o0", "o1"]
+    assert queue._active == {}
+    # Only orders that started have job documents, and none is left active
+    assert sorted(doc["order_id"] for doc in jobs.docs) == ["o0", "o1"]
+    assert {(doc["status"], doc["error"]) for doc in jobs.docs} == {("failed", "Cancelled")}
+
+
+def test_submit_after_cancelled_batch_queues_a_new_job():
+    jobs = FakeCollection()
+    queue = VerificationJobQueue(jobs, handler=None)
+
+    async def run():
+        await _cancelled_batch(queue, [])
+        return await queue.submit("o5")
+
+    job = asyncio.run(run())
+    assert job["status"] == "queued"
+    assert queue.pending() == 1
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from payment_verifier import CRYPTO_WALLETS
+from tests.fake_collection import FakeCollection
+from wallet_watcher import TRONSCAN_MAX_PAGES, TRONSCAN_PAGE_SIZE, WalletWatcher, match_transfers
+
+NOW = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def order(order_id, amount=90.0, transaction_hash=None, created_at=NOW, payment_method="USDT_TRC20"):
+    return {
+        "id": order_id,
+        "payment_method": payment_method,
+        "amount": amount,
+        "transaction_hash": transaction_hash,
+        "created_at": created_at
+    }
+
+
+def transfer(transaction_hash, amount=90.0, occurred_at=NOW, payment_method="USDT_TRC20"):
+    return {
+        "transaction_hash": transaction_hash,
+        "payment_method": payment_method,
+        "amount": amount,
+        "occurred_at": occurred_at
+    }
+
+
+def pairs(matches):
+    return sorted((order["id"], transfer["transaction_hash"]) for order, transfer in matches)
+
+
+def test_quoted_hash_matches_regardless_of_case():
+    matches = match_transfers([order("a", transaction_hash="0xABC")], [transfer("0xabc")])
+    assert pairs(matches) == [("a", "0xabc")]
+
+
+def test_quoted_hash_with_wrong_amount_is_left_for_verification():
+    matches = match_transfers([order("a", amount=150.0, transaction_hash="0xabc")], [transfer("0xabc", amount=90.0)])
+    assert matches == []
+
+
+def test_hash_match_takes_precedence_over_amount():
+    orders = [order("quoted", transaction_hash="tx1"), order("hashless")]
+    matches = match_transfers(orders, [transfer("tx1")])
+    assert pairs(matches) == [("quoted", "tx1")]
+
+
+def test_unique_amount_pair_is_matched():
+    orders = [order("a"), order("b", amount=150.0), order("c", payment_method="USDT_BSC")]
+    matches = match_transfers(orders, [transfer("tx1")])
+    assert pairs(matches) == [("a", "tx1")]
+
+
+def test_two_orders_for_one_amount_are_ambiguous():
+    matches = match_transfers([order("a"), order("b")], [transfer("tx1")])
+    assert matches == []
+
+
+def test_two_transfers_for_one_order_are_ambiguous():
+    matches = match_transfers([order("a")], [transfer("tx1"), transfer("tx2")])
+    assert matches == []
+
+
+def test_amount_match_needs_transfer_within_two_hours_of_order():
+    late = transfer("late", occurred_at=NOW + timedelta(hours=3))
+    assert match_transfers([order("a")], [late]) == []
+
+    prompt = transfer("prompt", occurred_at=NOW + timedelta(hours=1))
+    assert pairs(match_transfers([order("a")], [prompt])) == [("a", "prompt")]
+
+
+def test_stale_order_does_not_make_a_fresh_one_ambiguous():
+    orders = [order("abandoned", created_at=NOW - timedelta(days=1)), order("fresh")]
+    matches = match_transfers(orders, [transfer("tx1", occurred_at=NOW + timedelta(minutes=10))])
+    assert pairs(matches) == [("fresh", "tx1")]
+
+
+class _Verifier:
+    def __init__(self, pages):
+        self.requests = []
+        outer = self
+
+        class Provider:
+            async def get(self, url, params):
+                outer.requests.append(params)
+                page = params["start"] // TRONSCAN_PAGE_SIZE
+                rows = pages[page] if page < len(pages) else []
+                return httpx.Response(200, json={"token_transfers": rows})
+
+        self.providers = {"tronscan": Provider()}
+
+
+def _row(n, block_ts):
+    return {
+        "transaction_id": f"tx{n}",
+        "block_ts": block_ts,
+        "to_address": CRYPTO_WALLETS["USDT_TRC20"],
+        "quant": "90000000",
+        "confirmed": True
+    }
+
+
+def test_truncated_tron_listing_resumes_from_its_last_timestamp():
+    rows = [_row(n, 1_000 + n) for n in range(TRONSCAN_MAX_PAGES * TRONSCAN_PAGE_SIZE)]
+    pages = [rows[i:i + TRONSCAN_PAGE_SIZE] for i in range(0, len(rows), TRONSCAN_PAGE_SIZE)]
+    state = FakeCollection()
+    asyncio.run(state.insert_one({"_id": "USDT_TRC20", "cursor": 999}))
+    verifier = _Verifier(pages)
+    watcher = WalletWatcher(FakeCollection(), state, FakeCollection(), verifier, on_match=None)
+
+    transfers, cursor = asyncio.run(watcher._tron_transfers())
+
+    assert all(params["sort"] == "timestamp" for params in verifier.requests)
+    last_ts = rows[-1]["block_ts"]
+    assert cursor == last_ts - 1
+    # The boundary transfer is fetched again next time rather than kept now
+    assert [t["transaction_hash"] for t in transfers] == [row["transaction_id"] for row in rows[:-1]]